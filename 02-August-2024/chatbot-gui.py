@@ -1,24 +1,47 @@
-import requests
+import os
+import sys
+import time
 import tkinter as tk
 from tkinter import scrolledtext
 
-# API URL and headers
-API_URL = "https://api-inference.huggingface.co/models/google-bert/bert-large-uncased-whole-word-masking-finetuned-squad"
-headers = {"Authorization": "Bearer 'your token here"}
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from common.tk_tasks import TaskRunner
+from qa_cache import QACache
+from qa_client import QAClient
+
+# Pooled, retrying client; set QA_API_URL / QA_API_TOKEN to change the endpoint and token
+client = QAClient()
+# Repeated questions about the same context are answered from here instead of the endpoint
+cache = QACache()
 
 def query(payload):
-    response = requests.post(API_URL, headers=headers, json=payload)
-    return response.json()
+    inputs = payload["inputs"]
+    key = cache.key(inputs["question"], inputs["context"], client.url)
+    output = cache.get(key)
+    if output is None:
+        start = time.perf_counter()
+        output = client.query(payload)
+        cache.put(key, output, time.perf_counter() - start)
+    return output
+
+def show_response(text):
+    response_entry.config(state="normal")
+    response_entry.delete("1.0", "end")
+    response_entry.insert('end', text)
+    response_entry.config(state='disabled')
+
+def show_answer(output):
+    show_response(output.get('answer', 'No answer found in response.'))
+    stats = cache.stats()
+    cache_label.config(text=f"Cache hit rate {stats['hit_rate']:.0%}, {stats['seconds_saved']:.1f}s saved")
 
 def get_response():
     question = question_entry.get("1.0", "end").strip()
     context = context_entry.get("1.0", "end").strip()
 
     if not question or not context:
-        response_entry.config(state="normal")
-        response_entry.delete("1.0", "end")
-        response_entry.insert("end", "Both question and context must be provided.")
-        response_entry.config(state='disabled')
+        show_response("Both question and context must be provided.")
         return
 
     payload = {
@@ -28,22 +51,26 @@ def get_response():
         }
     }
 
-    try:
-        output = query(payload)
-        answer = output.get('answer', 'No answer found in response.')
-    except Exception as e:
-        answer = f"An error occurred: {e}"
+    # The request runs on a task thread so the window stays responsive. Asking
+    # the same thing again while it runs is ignored; a new question replaces it.
+    show_response("Waiting for the model...")
+    tasks.submit(query, payload, key='query', on_done=show_answer,
+                 on_error=lambda e: show_response(f"An error occurred: {e}"))
 
-    response_entry.config(state="normal")
-    response_entry.delete("1.0", "end")
-    response_entry.insert('end', answer)
-    response_entry.config(state='disabled')    
+def on_close():
+    tasks.shutdown()
+    client.close()
+    print(f"Answer cache: {cache.stats()}")
+    cache.close()
+    root.destroy()
 
 # Create the main window
 root = tk.Tk()
 root.title("GenAI Q&A App")
 root.geometry("900x700")
 root.configure(bg='#f4f4f4')
+root.protocol("WM_DELETE_WINDOW", on_close)
+tasks = TaskRunner(root)
 
 # Title label
 title_label = tk.Label(root, text="GenAI Question & Answer App", font=('Helvetica', 24, 'bold'), bg='#f4f4f4', fg='#333333')
@@ -81,5 +108,9 @@ response_label.pack(anchor='w', padx=10, pady=5)
 response_entry = scrolledtext.ScrolledText(response_frame, wrap=tk.WORD, width=110, height=10, font=('Helvetica', 14), bg='#ffffff', fg='#000000', state='disabled')
 response_entry.pack(padx=10, pady=5, fill='both', expand=True)
 
+# Answer cache statistics
+cache_label = tk.Label(root, text='', font=('Helvetica', 12, 'italic'), bg='#f4f4f4', fg='#333333')
+cache_label.pack(pady=5)
+
 # Start the GUI event loop
 root.mainloop()
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'qa_cache.sqlite')
+TTL = 7 * 24 * 3600  # answers are kept for a week
+
+
+# Case, spacing and trailing punctuation do not change the question
+def normalize_question(question):
+    return re.sub(r'\s+', ' ', question).strip().rstrip('?!. ').lower()
+
+
+# Answers from the Q&A endpoint in two tiers: a small in-memory LRU in front
+# of an sqlite file that survives restarts. Entries are keyed on the
+# normalized question, the context and the model URL and expire after `ttl`
+# seconds. Each entry also remembers how long the request took, so stats()
+# can report the time the hits saved.
+class QACache:
+    def __init__(self, path=CACHE_PATH, maxsize=256, ttl=TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS answers '
+                             '(key TEXT PRIMARY KEY, value TEXT, seconds REAL, expires REAL)')
+            self._db.execute('DELETE FROM answers WHERE expires < ?', (time.time(),))
+            self._db.commit()
+
+    @staticmethod
+    def key(question, context, url):
+        text = json.dumps([normalize_question(question), context, url])
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] >= now:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                self.seconds_saved += entry[1]
+                return entry[0]
+            self._entries.pop(key, None)
+            row = None
+            if self._db is not None:
+                row = self._db.execute('SELECT value, seconds, expires FROM answers WHERE key = ? AND expires >= ?',
+                                       (key, now)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value = json.loads(row[0])
+            self._remember(key, (value, row[1], row[2]))
+            self.disk_hits += 1
+            self.seconds_saved += row[1]
+            return value
+
+    # seconds: how long the endpoint took to produce value
+    def put(self, key, value, seconds):
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, (value, seconds, expires))
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?)',
+                                 (key, json.dumps(value), seconds, expires))
+                self._db.commit()
+
+    def _remember(self, key, entry):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {'memory_hits': self.memory_hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0, 'seconds_saved': self.seconds_saved}
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# The endpoint can be pointed elsewhere (e.g. the local stand-in in
+# benchmarks/qa_endpoint.py) with QA_API_URL; QA_API_TOKEN is sent as the
+# bearer token when set
+API_URL = os.environ.get('QA_API_URL', "https://api-inference.huggingface.co/models/google-bert/bert-large-uncased-whole-word-masking-finetuned-squad")
+API_TOKEN = os.environ.get('QA_API_TOKEN')
+
+# (connect, read) seconds; the read timeout covers the model's answer time
+TIMEOUT = (5, 30)
+
+
+class QAServiceError(Exception):
+    pass
+
+
+# HTTP client for the question answering endpoint. One requests.Session keeps
+# connections alive between questions, so only the first request pays for the
+# TCP and TLS handshakes. Every request has a timeout, at most max_concurrency
+# requests are in flight at once (callers beyond that wait their turn), and
+# 503 "model is loading" responses are retried up to `retries` times, waiting
+# the server's estimated_time when given, else exponential backoff.
+class QAClient:
+    def __init__(self, url=API_URL, headers=None, timeout=TIMEOUT, retries=3, backoff=1.0, max_backoff=20.0,
+                 max_concurrency=4):
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        if headers is None and API_TOKEN:
+            headers = {"Authorization": f"Bearer {API_TOKEN}"}
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def query(self, payload):
+        with self._slots:
+            for attempt in range(self.retries + 1):
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+                if response.status_code != 503 or attempt == self.retries:
+                    break
+                time.sleep(self._retry_delay(response, attempt))
+        if response.status_code >= 400:
+            raise QAServiceError(f"{response.status_code} from the model endpoint: {self._error_message(response)}")
+        return response.json()
+
+    def _retry_delay(self, response, attempt):
+        delay = self.backoff * 2 ** attempt
+        try:
+            delay = float(response.json().get('estimated_time', delay))
+        except (ValueError, AttributeError):
+            pass
+        return min(delay, self.max_backoff)
+
+    @staticmethod
+    def _error_message(response):
+        try:
+            return response.json().get('error', response.text)
+        except (ValueError, AttributeError):
+            return response.text
+
+    def close(self):
+        self.session.close()
@@ -1,13 +1,20 @@
 import tkinter as tk
 import tkinter.messagebox as messagebox
-import nltk
-import csv
 import numpy as np
-import torch
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from transformers import AutoTokenizer, AutoModel
-from sklearn.metrics.pairwise import cosine_similarity
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from common.text_preprocessing import get_preprocessor
+from common import stage_timing, startup_probe
+from common.tk_tasks import TaskRunner
+from quiz_scoring import EmbeddingModel, ReferenceEmbeddings, load_question_bank, reference_cache_path, score_answer
+
+
+# How the similarities to a question's reference answers are combined: 'max' or 'weighted'
+SCORING_METHOD = 'max'
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
 
 
 class NLPQuizApp(tk.Tk):
@@ -18,10 +25,9 @@ class NLPQuizApp(tk.Tk):
         self.configure(bg='#f0f0f0')
 
         # Initialize NLP components
-        self.lemmatizer = WordNetLemmatizer()
-        self.stop_words = set(stopwords.words('english'))
-        self.tokenizer = AutoTokenizer.from_pretrained('sentence-transformers/all-MiniLM-L6-v2')
-        self.model = AutoModel.from_pretrained('sentence-transformers/all-MiniLM-L6-v2')
+        self.preprocessor = get_preprocessor('lemma')
+        # The model loads in the background so the window shows up immediately
+        self.embedder = EmbeddingModel(MODEL_NAME)
 
         # Load questions and answers
         self.questions_answers = self.load_questions_answers('questions_answers.csv')
@@ -29,17 +35,42 @@ class NLPQuizApp(tk.Tk):
         self.score = 0
         self.total_questions = len(self.questions_answers)
 
+        # Reference answer embeddings, one matrix per question, filled in once the model loads
+        self.references = ReferenceEmbeddings(reference_cache_path(self.embedder.cache_id), self.embedder.cache_id)
+        self.reference_embeddings = []
+        self.reference_error = None
+
+        # Answers are scored off the Tk thread
+        self.tasks = TaskRunner(self)
+
         # Create and place widgets
         self.create_widgets()
 
+        self.embedder.warm_up(after=self.build_reference_embeddings)
+        self.after(100, self.check_model_ready)
+        self.protocol('WM_DELETE_WINDOW', self.on_close)
+        # Ctrl+Alt+T toggles per-stage timing, Ctrl+Alt+P profiles the next answer
+        stage_timing.bind_keys(self)
+        stage_timing.start_exporter()
+        startup_probe.watch_window(self)
+
+    def on_close(self):
+        self.tasks.shutdown()
+        if stage_timing.is_enabled():
+            print(stage_timing.log_line())
+        self.destroy()
+
     def create_widgets(self):
         self.question_label = tk.Label(self, text='', bg='#f0f0f0', font=('Arial', 16), wraplength=400)
         self.question_label.pack(pady=20)
 
+        self.model_status_label = tk.Label(self, text='Loading language model...', bg='#f0f0f0', font=('Arial', 12, 'italic'))
+        self.model_status_label.pack()
+
         self.answer_entry = tk.Entry(self, width=50, font=('Arial', 14))
         self.answer_entry.pack(pady=10)
 
-        self.submit_button = tk.Button(self, text='Submit Answer', command=self.submit_answer, bg='#4CAF50', fg='white', font=('Arial', 14))
+        self.submit_button = tk.Button(self, text='Submit Answer', command=self.submit_answer, bg='#4CAF50', fg='white', font=('Arial', 14), state=tk.DISABLED)
         self.submit_button.pack(pady=10)
 
         self.result_label = tk.Label(self, text='', bg='#f0f0f0', font=('Arial', 14))
@@ -51,18 +82,35 @@ class NLPQuizApp(tk.Tk):
         self.progress_label = tk.Label(self, text='', bg='#f0f0f0', font=('Arial', 12))
         self.progress_label.pack(pady=10)
 
+    # Poll until the background model load has finished
+    def check_model_ready(self):
+        if not self.embedder.ready.is_set():
+            self.after(100, self.check_model_ready)
+            return
+        if self.embedder.error is not None:
+            self.model_status_label.config(text=f'Could not load the language model: {self.embedder.error}')
+            return
+        if self.reference_error is not None:
+            # The model works but answers cannot be scored, so Submit stays disabled
+            self.model_status_label.config(text=f'Could not embed the reference answers: {self.reference_error}')
+            messagebox.showerror("Error", f"Could not embed the reference answers: {self.reference_error}")
+            return
+        self.model_status_label.config(text='Language model ready')
+        self.submit_button.config(state=tk.NORMAL)
+        startup_probe.run_first_result(self, self.get_embedding, 'Python is a high-level programming language.')
+
+    # Runs on the model loading thread; only answers that changed since the last run are embedded.
+    # A failure here leaves the model loaded, so it is kept apart from embedder.error.
+    def build_reference_embeddings(self):
+        try:
+            self.reference_embeddings = self.references.build(self.questions_answers, self.embedder.embed_batch, self.preprocess_text)
+        except Exception as e:
+            self.reference_error = e
+
     def load_questions_answers(self, file_path):
         questions_answers = []
         try:
-            with open(file_path, mode='r', newline='', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                next(reader)  # Skip the header row
-                for row in reader:
-                    if len(row) == 2:
-                        question, answer = row
-                        questions_answers.append((question, answer))
-                    else:
-                        print(f"Skipping invalid row: {row}")
+            questions_answers = load_question_bank(file_path)
         except FileNotFoundError:
             messagebox.showerror("Error", "Questions and Answers file not found.")
         except Exception as e:
@@ -85,29 +133,39 @@ class NLPQuizApp(tk.Tk):
 
     def preprocess_text(self, text):
         # Tokenize, remove stopwords, and lemmatize the text
-        tokens = nltk.word_tokenize(text.lower())
-        filtered_tokens = [self.lemmatizer.lemmatize(token) for token in tokens if token not in self.stop_words]
-        return ' '.join(filtered_tokens)
+        return self.preprocessor(text)
 
     def get_embedding(self, text):
-        inputs = self.tokenizer(text, return_tensors='pt', padding=True, truncation=True)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        return outputs.last_hidden_state.mean(dim=1).numpy()
+        return self.embedder.embed(text)
 
     def submit_answer(self):
+        if self.reference_error is not None:
+            self.submit_button.config(state=tk.DISABLED)
+            messagebox.showerror("Error", f"Answers cannot be scored: {self.reference_error}")
+            return
         user_answer = self.answer_entry.get().strip()
-        correct_answer = self.questions_answers[self.current_question_index][1].strip()
-
-        preprocessed_user_answer = self.preprocess_text(user_answer)
-        preprocessed_correct_answer = self.preprocess_text(correct_answer)
-
-        user_embedding = self.get_embedding(preprocessed_user_answer)
-        correct_embedding = self.get_embedding(preprocessed_correct_answer)
-
-        similarity_score = cosine_similarity(user_embedding, correct_embedding)[0][0]
-
-        print(f"Similarity Score: {similarity_score:.4f}")
+        # The embedding is computed on a task thread; clicking Submit again
+        # while it runs does not score the answer twice
+        self.tasks.submit(self.embed_answer, user_answer, key='score',
+                          on_done=lambda user_embedding: self.show_result(user_answer, user_embedding),
+                          on_error=lambda e: messagebox.showerror("Error", f"Could not score the answer: {e}"))
+
+    # Runs on a task thread
+    def embed_answer(self, user_answer):
+        with stage_timing.request('quiz.submit_answer'):
+            with stage_timing.span('quiz.preprocess'):
+                text = self.preprocess_text(user_answer)
+            return self.get_embedding(text)
+
+    def show_result(self, user_answer, user_embedding):
+        correct_answers = self.questions_answers[self.current_question_index][1]
+
+        # The reference answers were embedded when the question bank loaded,
+        # so this is the only forward pass; all references are scored at once
+        references = self.reference_embeddings[self.current_question_index]
+        with stage_timing.span('quiz.score'):
+            similarity_score, similarities = score_answer(user_embedding, references, SCORING_METHOD)
+        correct_answer = correct_answers[int(similarities.argmax())]
 
         threshold = 0.5  
         if similarity_score > threshold:
@@ -122,11 +180,12 @@ class NLPQuizApp(tk.Tk):
                            f"Correct Answer: '{correct_answer}'\n"
                            f"Similarity Score: {similarity_score * 100:.2f}%")
 
-        self.result_label.config(text=result_text)
+        with stage_timing.span('quiz.render'):
+            self.result_label.config(text=result_text)
 
-        # next question
-        self.current_question_index += 1
-        self.display_next_question()
+            # next question
+            self.current_question_index += 1
+            self.display_next_question()
 
     def show_score_analysis(self):
         result_text = f"Quiz completed!\n\nYour Score: {self.score}/{self.total_questions}"
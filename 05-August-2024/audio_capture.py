@@ -0,0 +1,127 @@
+import os
+import queue
+import tempfile
+import threading
+
+import sounddevice as sd
+import soundfile as sf
+import speech_recognition as sr
+
+# Speech recognizers work on 16 kHz mono 16-bit PCM, so record in that format
+# instead of the device default (44.1 kHz float32) and skip resampling later
+SAMPLE_RATE = 16000
+CHANNELS = 1
+DTYPE = 'int16'
+SAMPLE_WIDTH = 2  # bytes per int16 sample
+BLOCK_SIZE = 1600  # 100 ms per callback
+MAX_QUEUED_BLOCKS = 300  # 30 s of audio waiting for the writer
+
+
+# A WAV path unique to this process, for when a recording has to go through a
+# file; concurrent sessions no longer overwrite each other's recording.wav
+def session_audio_path(prefix='recording-'):
+    descriptor, path = tempfile.mkstemp(prefix=prefix, suffix='.wav')
+    os.close(descriptor)
+    return path
+
+
+# Records the microphone in the background. The audio callback only puts each
+# block on a queue and a writer thread drains it, either into an in-memory PCM
+# buffer (path=None, 32 KB per second of speech) or into an open SoundFile.
+# listener, if given, also gets every block from the writer thread (used to
+# transcribe while recording). stop() returns as soon as the stream is closed
+# and `finished` is set once the writer has caught up. The queue holds at most
+# max_queued blocks; if the writer stalls, newer blocks are dropped (and
+# counted in `dropped`) rather than letting memory grow.
+class StreamingRecorder:
+    def __init__(self, path=None, samplerate=SAMPLE_RATE, channels=CHANNELS, blocksize=BLOCK_SIZE, listener=None,
+                 max_queued=MAX_QUEUED_BLOCKS):
+        self.path = path
+        self.listener = listener
+        self.pcm = None
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.frames = 0
+        self.dropped = 0
+        self.error = None
+        self.finished = threading.Event()
+        self._blocks = queue.Queue(maxsize=max_queued)
+        self._stopped = False
+        self._stream = None
+        self._writer = None
+
+    def start(self):
+        self.finished.clear()
+        self.frames = 0
+        self.dropped = 0
+        self.error = None
+        self._stopped = False
+        self.pcm = bytearray() if self.path is None else None
+        self._writer = threading.Thread(target=self._write, daemon=True)
+        self._writer.start()
+        self._stream = sd.InputStream(samplerate=self.samplerate, channels=self.channels, dtype=DTYPE,
+                                      blocksize=self.blocksize, callback=self._callback)
+        self._stream.start()
+
+    def _callback(self, indata, frames, time, status):
+        if status:
+            print(status)
+        try:
+            self._blocks.put_nowait(indata.copy())
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self):
+        try:
+            if self.path is None:
+                self._drain(self._append_pcm)
+            else:
+                with sf.SoundFile(self.path, mode='w', samplerate=self.samplerate, channels=self.channels,
+                                  subtype='PCM_16') as file:
+                    self._drain(file.write)
+        except Exception as e:
+            self.error = e
+            # Keep draining until stop() so the stream never waits on a full
+            # queue; the sentinel may already be consumed (e.g. when the
+            # error came from closing the file)
+            while not self._stopped:
+                self._stopped = self._blocks.get() is None
+        finally:
+            self.finished.set()
+
+    # Hand every queued block to sink until stop() queues the None sentinel
+    def _drain(self, sink):
+        while True:
+            block = self._blocks.get()
+            if block is None:
+                self._stopped = True
+                break
+            sink(block)
+            self.frames += len(block)
+            if self.listener is not None:
+                self.listener(block)
+
+    def _append_pcm(self, block):
+        self.pcm += block.data
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+            self._blocks.put(None)
+
+    @property
+    def duration(self):
+        return self.frames / self.samplerate
+
+    # The captured speech for the recognizer. In memory mode the PCM buffer is
+    # handed over as is, without copying or a WAV encode/decode; otherwise the
+    # WAV file is read back.
+    def audio_data(self, recognizer=None):
+        if self.pcm is not None:
+            return sr.AudioData(self.pcm, self.samplerate, SAMPLE_WIDTH)
+        recognizer = recognizer or sr.Recognizer()
+        with sr.AudioFile(self.path) as source:
+            return recognizer.record(source)
@@ -0,0 +1,147 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BASE_DIR))
+
+from common.embedding_server import DEFAULT_SERVER
+from common.inference_backend import BACKENDS, DEFAULT_BACKEND
+from common.text_preprocessing import get_preprocessor
+from quiz_scoring import EmbeddingModel, ReferenceEmbeddings, read_question_bank, reference_cache_path, score_answer
+
+QUESTION_BANK = os.path.join(BASE_DIR, 'questions_answers.csv')
+MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+HISTOGRAM_BINS = np.linspace(0.0, 1.0, 11)
+
+
+# Grades recorded exam answers without the Tk front-end. Student answers are
+# embedded in padded batches; the reference answers come from the same
+# persistent cache the quiz apps use, so they are only embedded once.
+class BatchGrader:
+    def __init__(self, question_bank=QUESTION_BANK, model_name=MODEL_NAME, scoring='max', threshold=0.5, batch_size=32,
+                 max_length=None, inference_backend=DEFAULT_BACKEND, embedding_server=DEFAULT_SERVER):
+        self.scoring = scoring
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.preprocessor = get_preprocessor('lemma')
+        self.embedder = EmbeddingModel(model_name, max_length, inference_backend, embedding_server)
+        self.embedder.load()
+        if self.embedder.error is not None:
+            raise RuntimeError(f"Could not load {model_name}: {self.embedder.error}")
+
+        questions = read_question_bank(question_bank)
+        cache = ReferenceEmbeddings(os.path.join(BASE_DIR, reference_cache_path(self.embedder.cache_id)), self.embedder.cache_id)
+        matrices = cache.build([(question, answers) for _, question, answers in questions], self.embedder.embed_batch, self.preprocessor)
+        self.references = {question_id: matrix for (question_id, _, _), matrix in zip(questions, matrices)}
+
+    # rows: dicts with student, question_id and answer_text
+    def grade(self, rows):
+        texts = self.preprocessor.preprocess_many([row['answer_text'] for row in rows])
+        embeddings = self.embedder.embed_batch(texts, self.batch_size)
+        results = []
+        for row, embedding in zip(rows, embeddings):
+            references = self.references.get(str(row['question_id']).strip())
+            if references is None:
+                results.append({**row, 'score': None, 'correct': None, 'similarities': []})
+                continue
+            score, similarities = score_answer(embedding, references, self.scoring)
+            results.append({**row, 'score': score, 'correct': score > self.threshold,
+                            'similarities': [round(float(value), 4) for value in similarities]})
+        return results
+
+
+# Spread of the scores: percentiles, pass rate and a 0.1-wide histogram
+def distribution(scores, threshold):
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.size == 0:
+        return {'count': 0}
+    percentiles = np.percentile(scores, [10, 25, 50, 75, 90])
+    histogram, _ = np.histogram(np.clip(scores, 0.0, 1.0), bins=HISTOGRAM_BINS)
+    return {
+        'count': int(scores.size),
+        'mean': float(scores.mean()),
+        'std': float(scores.std()),
+        'min': float(scores.min()),
+        'p10': float(percentiles[0]), 'p25': float(percentiles[1]), 'p50': float(percentiles[2]),
+        'p75': float(percentiles[3]), 'p90': float(percentiles[4]),
+        'max': float(scores.max()),
+        'pass_rate': float((scores > threshold).mean()),
+        'histogram': histogram.tolist(),
+    }
+
+
+def read_roster(path):
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, 'r', newline='', encoding='utf-8') as file:
+            yield from csv.DictReader(file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grade a roster of (student, question_id, answer_text) rows.')
+    parser.add_argument('roster', help='.csv or .jsonl roster file')
+    parser.add_argument('output', help='CSV file with one score per roster row')
+    parser.add_argument('--summary', help='JSON file for the per-question and overall similarity distributions')
+    parser.add_argument('--question-bank', default=QUESTION_BANK)
+    parser.add_argument('--model', default=MODEL_NAME)
+    parser.add_argument('--scoring', choices=['max', 'weighted'], default='max')
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--max-length', type=int, default=None, help='truncate answers to this many tokens')
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND, help='fp32, int8 (dynamic quantization) or onnx inference')
+    parser.add_argument('--embedding-server', default=DEFAULT_SERVER, help='URL of a shared embedding server to use instead of loading the model')
+    parser.add_argument('--threads', type=int, default=None, help='torch intra-op threads')
+    parser.add_argument('--chunk-size', type=int, default=1024, help='roster rows read and graded at a time')
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+
+    grader = BatchGrader(args.question_bank, args.model, args.scoring, args.threshold, args.batch_size, args.max_length,
+                         args.backend, args.embedding_server)
+
+    scores_by_question = {}
+    graded = 0
+    start = time.perf_counter()
+    rows = read_roster(args.roster)
+    with open(args.output, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(['student', 'question_id', 'score', 'correct', 'similarities'])
+        while True:
+            chunk = list(islice(rows, args.chunk_size))
+            if not chunk:
+                break
+            for result in grader.grade(chunk):
+                writer.writerow([result['student'], result['question_id'],
+                                 '' if result['score'] is None else f"{result['score']:.4f}",
+                                 '' if result['correct'] is None else int(result['correct']),
+                                 ' '.join(str(value) for value in result['similarities'])])
+                if result['score'] is not None:
+                    scores_by_question.setdefault(str(result['question_id']).strip(), []).append(result['score'])
+            graded += len(chunk)
+    elapsed = time.perf_counter() - start
+
+    print(f"Graded {graded} answers in {elapsed:.1f}s ({graded / max(elapsed, 1e-9):.1f} answers/sec)")
+    if args.summary:
+        summary = {
+            'overall': distribution([score for scores in scores_by_question.values() for score in scores], args.threshold),
+            'questions': {question_id: distribution(scores, args.threshold) for question_id, scores in scores_by_question.items()},
+        }
+        with open(args.summary, 'w', encoding='utf-8') as file:
+            json.dump(summary, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import csv
+import hashlib
+import os
+import sys
+import threading
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from common.embedding_server import DEFAULT_SERVER, EmbeddingClient
+from common.inference_backend import DEFAULT_BACKEND, check_backend, load_transformer, mean_pooled_embeddings
+from common.stage_timing import span
+
+
+# Cosine similarity between every row of a and every row of b
+def cosine_similarity(a, b):
+    a = np.atleast_2d(a)
+    b = np.atleast_2d(b)
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return a @ b.T
+
+
+# Transformer used to embed answers. torch and transformers are only imported
+# when the model loads, and warm_up() does that on a background thread so the
+# window can be drawn first; `ready` is set once loading has finished.
+# max_length caps the tokens per text (None keeps the model's own limit) and
+# backend picks fp32, int8 or onnx inference (see common/inference_backend.py).
+# With a server URL (EMBEDDING_SERVER by default) the model is not loaded
+# here: texts are sent to the shared embedding server, which gives the same
+# vectors (see common/embedding_server.py).
+class EmbeddingModel:
+    def __init__(self, model_name, max_length=None, backend=DEFAULT_BACKEND, server=DEFAULT_SERVER):
+        self.model_name = model_name
+        self.max_length = max_length
+        self.backend = check_backend(backend)
+        self.server = server
+        self.client = None
+        self.tokenizer = None
+        self.model = None
+        self.error = None
+        self.ready = threading.Event()
+        self._load_lock = threading.Lock()
+
+    # `after` runs on the same background thread once the model is loaded,
+    # before `ready` is set (used to precompute reference embeddings)
+    def warm_up(self, after=None):
+        threading.Thread(target=self.load, args=(after,), daemon=True).start()
+
+    def load(self, after=None):
+        with self._load_lock:
+            if self.ready.is_set():
+                return
+            try:
+                if self.server:
+                    self.client = EmbeddingClient(self.server)
+                else:
+                    self.tokenizer, self.model = load_transformer(self.model_name, self.backend)
+                self.embed('warm up')  # First forward pass is slow, get it out of the way
+                if after is not None:
+                    after()
+            except Exception as e:
+                self.error = e
+            finally:
+                self.ready.set()
+
+    # Identifies what the vectors depend on, for caches of embeddings
+    @property
+    def cache_id(self):
+        cache_id = self.model_name
+        if self.backend != 'fp32':
+            cache_id += f'-{self.backend}'
+        if self.max_length is not None:
+            cache_id += f'@{self.max_length}'
+        return cache_id
+
+    def _ensure_loaded(self):
+        if self.model is None and self.client is None:
+            self.load()
+            if self.error is not None:
+                raise RuntimeError(f"Could not load {self.model_name}: {self.error}")
+
+    def embed(self, text):
+        return self.embed_batch([text])
+
+    # Embed many texts in padded batches, rows in the order the texts were
+    # given (see mean_pooled_embeddings)
+    def embed_batch(self, texts, batch_size=32):
+        self._ensure_loaded()
+        if self.client is not None:
+            with span('embed.remote'):
+                return self.client.embed(texts, self.model_name, 'transformer', self.backend, self.max_length)
+        return mean_pooled_embeddings(self.tokenizer, self.model, texts, self.max_length, batch_size)
+
+
+# (question_id, question, answers) for every question in the bank CSV, where
+# answers holds each non-empty reference answer (the ans, ans1, ... columns)
+# and question_id is the sr_no column, or the 1-based position if that is
+# missing. Rows without a question or answer are skipped.
+def read_question_bank(file_path):
+    questions = []
+    with open(file_path, mode='r', newline='', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        answer_columns = [column for column in reader.fieldnames if column.startswith('ans')]
+        for row in reader:
+            question = (row.get('question') or '').strip()
+            answers = [row[column].strip() for column in answer_columns if (row.get(column) or '').strip()]
+            if question and answers:
+                question_id = (row.get('sr_no') or '').strip() or str(len(questions) + 1)
+                questions.append((question_id, question, answers))
+            elif any((value or '').strip() for value in row.values() if isinstance(value, str)):
+                print(f"Skipping invalid row: {row}")
+    return questions
+
+
+def load_question_bank(file_path):
+    return [(question, answers) for _, question, answers in read_question_bank(file_path)]
+
+
+def reference_cache_path(cache_id):
+    return f"reference_embeddings-{cache_id.replace('/', '_')}.npz"
+
+
+# Embeddings of the reference answers, persisted to an .npz file keyed on a hash
+# of each answer's text. When the question bank changes only new or edited
+# answers are embedded again; answers no longer in the bank are dropped.
+class ReferenceEmbeddings:
+    def __init__(self, cache_path, model_name):
+        self.cache_path = cache_path
+        self.model_name = model_name
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def load(self):
+        try:
+            with np.load(self.cache_path) as cache:
+                if str(cache['model_name']) != self.model_name:
+                    return {}
+                return dict(zip(cache['keys'].tolist(), cache['vectors']))
+        except (OSError, KeyError, ValueError):
+            return {}
+
+    def save(self, vectors):
+        keys = sorted(vectors)
+        matrix = np.stack([vectors[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+        tmp_path = self.cache_path + '.tmp.npz'
+        np.savez(tmp_path, model_name=np.array(self.model_name), keys=np.array(keys), vectors=matrix)
+        os.replace(tmp_path, self.cache_path)
+
+    # One (answers, dim) matrix per question. Answers not in the cache are
+    # embedded together with one embed_batch call.
+    def build(self, questions_answers, embed_batch, preprocess):
+        cached = self.load()
+        vectors = {}
+        missing = {}
+        for _, answers in questions_answers:
+            for answer in answers:
+                key = self.key(answer)
+                if key in cached:
+                    vectors[key] = cached[key]
+                else:
+                    missing[key] = answer
+        if missing:
+            embeddings = embed_batch([preprocess(answer) for answer in missing.values()])
+            vectors.update(zip(missing, np.asarray(embeddings, dtype=np.float32)))
+        if vectors.keys() != cached.keys():
+            self.save(vectors)
+        return [np.stack([vectors[self.key(answer)] for answer in answers]) for _, answers in questions_answers]
+
+
+# Score one answer embedding against all reference answers of a question in a
+# single vectorized op. 'max' takes the closest reference; 'weighted' averages
+# the similarities with the given per-reference weights (equal by default).
+# Returns the combined score and the per-reference similarities.
+def score_answer(answer_embedding, references, method='max', weights=None):
+    similarities = cosine_similarity(answer_embedding, references)[0]
+    if method == 'max':
+        return float(similarities.max()), similarities
+    if method == 'weighted':
+        weights = np.ones(len(similarities)) if weights is None else np.asarray(weights[:len(similarities)], dtype=np.float64)
+        return float(similarities @ weights / weights.sum()), similarities
+    raise ValueError(f"Unknown scoring method '{method}', expected 'max' or 'weighted'")
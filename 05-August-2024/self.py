@@ -1,18 +1,26 @@
 import tkinter as tk
 import tkinter.messagebox as messagebox
-import nltk
-import csv
-import numpy as np
-import torch
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from transformers import AutoTokenizer, AutoModel
-from sklearn.metrics.pairwise import cosine_similarity
-from pydub import AudioSegment
-import sounddevice as sd
-import soundfile as sf
-import os
 import speech_recognition as sr
+import os
+import sys
+from threading import Thread
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from common.text_preprocessing import get_preprocessor
+from common import stage_timing, startup_probe
+from common.tk_tasks import TaskRunner, check_cancelled, report_progress
+from audio_capture import StreamingRecorder, session_audio_path
+from speech_backends import DEFAULT_ASR_BACKEND, SegmentedTranscription, make_asr_backend, transcribe_recording
+from quiz_scoring import EmbeddingModel, ReferenceEmbeddings, load_question_bank, reference_cache_path, score_answer
+
+# How the similarities to a question's reference answers are combined: 'max' or 'weighted'
+SCORING_METHOD = 'max'
+MODEL_NAME = 'bert-base-uncased'
+# Keep each answer in a per-session WAV file instead of handing the recognizer the in-memory buffer
+RECORD_TO_FILE = False
+# 'google' (online) or 'vosk' (local, shows the transcript while the student speaks)
+ASR_BACKEND = DEFAULT_ASR_BACKEND
 
 class NLPQuizApp(tk.Tk):
     def __init__(self):
@@ -22,10 +30,9 @@ class NLPQuizApp(tk.Tk):
         self.configure(bg='#f8f9fa')
 
         # Initialize NLP components
-        self.lemmatizer = WordNetLemmatizer()
-        self.stop_words = set(stopwords.words('english'))
-        self.tokenizer = AutoTokenizer.from_pretrained('bert-base-uncased')
-        self.model = AutoModel.from_pretrained('bert-base-uncased')
+        self.preprocessor = get_preprocessor('lemma')
+        # The model loads in the background so the window shows up immediately
+        self.embedder = EmbeddingModel(MODEL_NAME)
 
         # Load questions and answers
         self.questions_answers = self.load_questions_answers('questions_answers.csv')
@@ -33,18 +40,54 @@ class NLPQuizApp(tk.Tk):
         self.score = 0
         self.total_questions = len(self.questions_answers)
 
+        # Reference answer embeddings, one matrix per question, filled in once the model loads
+        self.references = ReferenceEmbeddings(reference_cache_path(self.embedder.cache_id), self.embedder.cache_id)
+        self.reference_embeddings = []
+        self.reference_error = None
+
         # Variables for audio recording
         self.recording = False
-        self.audio_file = 'recording.wav'
-        self.audio_data = []
+        self.audio_file = session_audio_path() if RECORD_TO_FILE else None
+        self.recorder = None
+
+        # Speech recognizer, loaded in the background like the language model
+        self.asr = None
+        self.asr_error = None
+        self.transcription = None
+        Thread(target=self.load_asr, daemon=True).start()
+
+        # Scoring and speech recognition run off the Tk thread
+        self.tasks = TaskRunner(self)
 
         # Create and place widgets
         self.create_widgets()
 
+        self.embedder.warm_up(after=self.build_reference_embeddings)
+        self.after(100, self.check_model_ready)
+        self.protocol('WM_DELETE_WINDOW', self.on_close)
+        # Ctrl+Alt+T toggles per-stage timing, Ctrl+Alt+P profiles the next answer
+        stage_timing.bind_keys(self)
+        stage_timing.start_exporter()
+        startup_probe.watch_window(self)
+
+    def on_close(self):
+        self.tasks.shutdown()
+        self.replace_transcription(None)
+        if self.recording:
+            self.recorder.stop()
+        if self.audio_file is not None and os.path.exists(self.audio_file):
+            os.remove(self.audio_file)
+        if stage_timing.is_enabled():
+            print(stage_timing.log_line())
+        self.destroy()
+
     def create_widgets(self):
         self.question_label = tk.Label(self, text='', bg='#f8f9fa', font=('Helvetica', 16, 'bold'), wraplength=500)
         self.question_label.pack(pady=20)
 
+        self.model_status_label = tk.Label(self, text='Loading language model...', bg='#f8f9fa', font=('Helvetica', 12, 'italic'))
+        self.model_status_label.pack()
+
         self.answer_entry = tk.Entry(self, width=50, font=('Helvetica', 14))
         self.answer_entry.pack(pady=10)
 
@@ -81,18 +124,41 @@ class NLPQuizApp(tk.Tk):
         self.correct_answer_label = tk.Label(self, text='', bg='#f8f9fa', font=('Helvetica', 12))
         self.correct_answer_label.pack(pady=10)
 
+    # Poll until the background model load has finished
+    def check_model_ready(self):
+        if not self.embedder.ready.is_set():
+            self.after(100, self.check_model_ready)
+            return
+        if self.embedder.error is not None:
+            self.model_status_label.config(text=f'Could not load the language model: {self.embedder.error}')
+            return
+        if self.reference_error is not None:
+            # The model works but answers cannot be scored, so Submit stays disabled
+            self.model_status_label.config(text=f'Could not embed the reference answers: {self.reference_error}')
+            self.submit_answer_button.config(state=tk.DISABLED)
+            messagebox.showerror("Error", f"Could not embed the reference answers: {self.reference_error}")
+            return
+        self.model_status_label.config(text='Language model ready')
+        startup_probe.run_first_result(self, self.get_embedding, 'Python is a high-level programming language.')
+
+    def load_asr(self):
+        try:
+            self.asr = make_asr_backend(ASR_BACKEND)
+        except Exception as e:
+            self.asr_error = e
+
+    # Runs on the model loading thread; only answers that changed since the last run are embedded.
+    # A failure here leaves the model loaded, so it is kept apart from embedder.error.
+    def build_reference_embeddings(self):
+        try:
+            self.reference_embeddings = self.references.build(self.questions_answers, self.embedder.embed_batch, self.preprocess_text)
+        except Exception as e:
+            self.reference_error = e
+
     def load_questions_answers(self, file_path):
         questions_answers = []
         try:
-            with open(file_path, mode='r', newline='', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                next(reader)  # Skip the header row
-                for row in reader:
-                    if len(row) == 2:
-                        question, answer = row
-                        questions_answers.append((question, answer))
-                    else:
-                        print(f"Skipping invalid row: {row}")
+            questions_answers = load_question_bank(file_path)
         except FileNotFoundError:
             messagebox.showerror("Error", "Questions and Answers file not found.")
         except Exception as e:
@@ -114,17 +180,21 @@ class NLPQuizApp(tk.Tk):
             self.show_score_analysis()
 
     def preprocess_text(self, text):
-        tokens = nltk.word_tokenize(text.lower())
-        filtered_tokens = [self.lemmatizer.lemmatize(token) for token in tokens if token not in self.stop_words]
-        return ' '.join(filtered_tokens)
+        # Tokenize, remove stopwords, and lemmatize the text
+        return self.preprocessor(text)
 
     def get_embedding(self, text):
-        inputs = self.tokenizer(text, return_tensors='pt', padding=True, truncation=True)
-        with torch.no_grad():
-            outputs = self.model(**inputs)
-        return outputs.last_hidden_state.mean(dim=1).numpy()
+        return self.embedder.embed(text)
 
     def submit_answer(self):
+        if not self.embedder.ready.is_set():
+            messagebox.showinfo("Please wait", "The language model is still loading.")
+            return
+        error = self.embedder.error or self.reference_error
+        if error is not None:
+            self.submit_answer_button.config(state=tk.DISABLED)
+            messagebox.showerror("Error", f"Answers cannot be scored: {error}")
+            return
         self.compare_answer(self.converted_text_label.cget("text"))
 
     def show_score_analysis(self):
@@ -144,67 +214,148 @@ class NLPQuizApp(tk.Tk):
         self.stop_record_button.config(state=tk.NORMAL)
         self.convert_audio_button.config(state=tk.DISABLED)
         self.submit_answer_button.config(state=tk.DISABLED)
-        self.audio_data = []
 
-        def callback(indata, frames, time, status):
-            if status:
-                print(status)
-            self.audio_data.append(indata.copy())
+        # Transcription starts while the student is still speaking: a streaming
+        # recognizer gets every block, any other gets each pause-delimited segment
+        if self.asr is None:
+            self.replace_transcription(None)
+        elif self.asr.streaming:
+            self.replace_transcription(self.asr.stream())
+        else:
+            self.replace_transcription(SegmentedTranscription(self.asr))
+        listener = self.transcription.feed if self.transcription is not None else None
 
-        self.stream = sd.InputStream(callback=callback)
-        self.stream.start()
+        # Blocks are buffered (or written to the WAV file) as they arrive, at 16 kHz mono
+        self.recorder = StreamingRecorder(self.audio_file, listener=listener)
+        self.recorder.start()
+        if self.transcription is not None:
+            self.follow_transcription(self.transcription, 'quiz.transcribe_while_recording')
 
     def stop_recording(self):
         if self.recording:
             self.recording = False
-            self.stream.stop()
-            self.stream.close()
-
-            # Save the recorded data as a WAV file
-            self.audio_data = np.concatenate(self.audio_data, axis=0)
-            sf.write(self.audio_file, self.audio_data, 44100)
-
+            self.recorder.stop()
             self.stop_record_button.config(state=tk.DISABLED)
+            self.after(50, self.check_recording_saved)
+
+    # Poll until the writer thread has flushed the last blocks to disk
+    def check_recording_saved(self):
+        if not self.recorder.finished.is_set():
+            self.after(50, self.check_recording_saved)
+            return
+        if self.recorder.error is not None:
+            # Reported here only: the transcription of the broken recording is
+            # dropped before it can raise an error dialog of its own
+            self.tasks.cancel('transcribe')
+            self.replace_transcription(None)
+            messagebox.showerror("Error", f"Could not save the recording: {self.recorder.error}")
+            self.record_button.config(state=tk.NORMAL)
+            return
+        if self.transcription is not None:
+            self.transcription.close()
+        # show_transcript re-enables it once the final text is in
+        if self.transcription is None:
             self.convert_audio_button.config(state=tk.NORMAL)
 
     def convert_audio_to_text(self):
-        if os.path.exists(self.audio_file):
-            recognizer = sr.Recognizer()
-            with sr.AudioFile(self.audio_file) as source:
-                audio_data = recognizer.record(source)
-                try:
-                    text = recognizer.recognize_google(audio_data)
-                    self.converted_text_label.config(text=f"Converted Text: {text}")
-                    self.submit_answer_button.config(state=tk.NORMAL)
-                except sr.UnknownValueError:
-                    messagebox.showerror("Error", "Google Speech Recognition could not understand audio")
-                except sr.RequestError as e:
-                    messagebox.showerror("Error", f"Could not request results from Google Speech Recognition service; {e}")
+        if self.asr is None:
+            if self.asr_error is not None:
+                messagebox.showerror("Error", f"Could not load the speech recognizer: {self.asr_error}")
+            else:
+                messagebox.showinfo("Please wait", "The speech recognizer is still loading.")
+            return
+        if self.recorder is not None and self.recorder.finished.is_set() and self.recorder.frames:
+            # Recognition runs on worker threads so the window stays responsive
+            self.convert_audio_button.config(state=tk.DISABLED)
+            self.converted_text_label.config(text="Converting...")
+            with stage_timing.span('asr.audio_data'):
+                audio_data = self.recorder.audio_data()
+            self.replace_transcription(transcribe_recording(self.asr, audio_data))
+            self.follow_transcription(self.transcription, 'quiz.convert_audio_to_text')
         else:
-            messagebox.showerror("Error", "No audio file found. Please record first.")
-
-    def compare_answer(self, user_answer_text):
-        _, correct_answer = self.questions_answers[self.current_question_index]
-        user_answer_text = self.preprocess_text(user_answer_text)
-        correct_answer = self.preprocess_text(correct_answer)
-
-        user_embedding = self.get_embedding(user_answer_text)
-        correct_embedding = self.get_embedding(correct_answer)
-
-        similarity = cosine_similarity(user_embedding, correct_embedding)[0][0]
-        self.similarity_label.config(text=f"Similarity Score: {similarity:.2f}")
-
-        if similarity > 0.8:  # Adjust threshold as needed
-            self.score += 1
-            self.result_label.config(text="Correct!")
+            messagebox.showerror("Error", "No recording found. Please record first.")
+
+    # A transcription that is replaced before it finished is cancelled, so its
+    # thread and worker pool do not keep running for nobody
+    def replace_transcription(self, transcription):
+        if self.transcription is not None and not self.transcription.finished.is_set():
+            self.transcription.cancel()
+        self.transcription = transcription
+
+    # Show partial transcripts until the recognizer is done, then the final
+    # text; a new recording or conversion replaces the one being followed.
+    # stage names the request in the pipeline timings.
+    def follow_transcription(self, transcription, stage):
+        self.tasks.submit(self.wait_for_transcript, transcription, stage, key='transcribe',
+                          on_done=self.show_transcript, on_error=self.show_transcription_error,
+                          on_progress=self.show_partial_transcript)
+
+    # Runs on a task thread
+    def wait_for_transcript(self, transcription, stage):
+        with stage_timing.request(stage):
+            while not transcription.finished.wait(0.1):
+                check_cancelled()
+                report_progress(message=transcription.partial)
+        if transcription.error is not None:
+            raise transcription.error
+        return transcription.text
+
+    def show_partial_transcript(self, fraction, partial):
+        if partial:
+            self.converted_text_label.config(text=f"Hearing: {partial}")
+
+    def show_transcript(self, text):
+        with stage_timing.span('quiz.render'):
+            self.transcription = None
+            self.convert_audio_button.config(state=tk.NORMAL)
+            self.converted_text_label.config(text=f"Converted Text: {text}")
+            if self.embedder.error is None and self.reference_error is None:
+                self.submit_answer_button.config(state=tk.NORMAL)
+
+    def show_transcription_error(self, error):
+        self.transcription = None
+        self.convert_audio_button.config(state=tk.NORMAL)
+        if isinstance(error, sr.UnknownValueError):
+            messagebox.showerror("Error", "Speech recognition could not understand audio")
+        elif isinstance(error, sr.RequestError):
+            messagebox.showerror("Error", f"Could not request results from the speech recognition service; {error}")
         else:
-            self.result_label.config(text="Incorrect.")
-        
-        self.current_question_index += 1
-        self.display_next_question()
+            messagebox.showerror("Error", f"Speech recognition failed: {error}")
 
-        # Re-enable the Start Recording button
-        self.record_button.config(state=tk.NORMAL)
+    def compare_answer(self, user_answer_text):
+        # The embedding is computed on a task thread; clicking Submit again
+        # while it runs does not score the answer twice
+        self.tasks.submit(self.embed_answer, user_answer_text, key='score', on_done=self.show_similarity,
+                          on_error=lambda e: messagebox.showerror("Error", f"Could not score the answer: {e}"))
+
+    # Runs on a task thread
+    def embed_answer(self, user_answer_text):
+        with stage_timing.request('quiz.compare_answer'):
+            with stage_timing.span('quiz.preprocess'):
+                text = self.preprocess_text(user_answer_text)
+            return self.get_embedding(text)
+
+    def show_similarity(self, user_embedding):
+        # The reference answers were embedded when the question bank loaded,
+        # so this is the only forward pass; all references are scored at once
+        references = self.reference_embeddings[self.current_question_index]
+        with stage_timing.span('quiz.score'):
+            similarity, _ = score_answer(user_embedding, references, SCORING_METHOD)
+
+        with stage_timing.span('quiz.render'):
+            self.similarity_label.config(text=f"Similarity Score: {similarity:.2f}")
+
+            if similarity > 0.8:  # Adjust threshold as needed
+                self.score += 1
+                self.result_label.config(text="Correct!")
+            else:
+                self.result_label.config(text="Incorrect.")
+
+            self.current_question_index += 1
+            self.display_next_question()
+
+            # Re-enable the Start Recording button
+            self.record_button.config(state=tk.NORMAL)
 
 if __name__ == "__main__":
     app = NLPQuizApp()
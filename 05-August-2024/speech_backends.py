@@ -0,0 +1,238 @@
+import json
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import numpy as np
+import speech_recognition as sr
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from audio_capture import SAMPLE_RATE, SAMPLE_WIDTH
+from common.stage_timing import span
+from vad import SpeechSegmenter
+
+# Which speech-to-text engine the quiz uses:
+#   google - Google Web Speech API through speech_recognition (needs network)
+#   vosk   - local Kaldi model on the CPU, works offline and streams partial
+#            results while the student is speaking (pip install vosk and
+#            download a model, e.g. vosk-model-small-en-us-0.15)
+ASR_BACKENDS = ('google', 'vosk')
+DEFAULT_ASR_BACKEND = os.environ.get('QUIZ_ASR_BACKEND', 'google')
+VOSK_MODEL_PATH = os.environ.get('VOSK_MODEL_PATH', 'vosk-model-small-en-us-0.15')
+# Speech segments recognized at the same time by SegmentedTranscription
+SEGMENT_WORKERS = 4
+
+
+class GoogleBackend:
+    name = 'google'
+    streaming = False
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+
+    def transcribe(self, audio_data):
+        return self.recognizer.recognize_google(audio_data)
+
+
+class VoskBackend:
+    name = 'vosk'
+    streaming = True
+
+    def __init__(self, model_path=VOSK_MODEL_PATH, samplerate=SAMPLE_RATE):
+        from vosk import Model, SetLogLevel
+        SetLogLevel(-1)
+        if not os.path.isdir(model_path):
+            raise RuntimeError(f"Vosk model not found at '{model_path}', set VOSK_MODEL_PATH")
+        self.model = Model(model_path)
+        self.samplerate = samplerate
+
+    def session(self):
+        from vosk import KaldiRecognizer
+        return VoskSession(KaldiRecognizer(self.model, self.samplerate))
+
+    def transcribe(self, audio_data):
+        session = self.session()
+        session.accept(audio_data.get_raw_data(convert_rate=self.samplerate, convert_width=SAMPLE_WIDTH))
+        return session.finish()
+
+    def stream(self):
+        return StreamingTranscriber(self.session())
+
+
+# One utterance-by-utterance recognition pass over 16 kHz int16 PCM
+class VoskSession:
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+        self.utterances = []
+
+    # Returns the transcript so far, including the words of the current utterance
+    def accept(self, pcm):
+        if self.recognizer.AcceptWaveform(bytes(pcm)):
+            self._add(json.loads(self.recognizer.Result()).get('text', ''))
+            return ' '.join(self.utterances)
+        partial = json.loads(self.recognizer.PartialResult()).get('partial', '')
+        return ' '.join(self.utterances + ([partial] if partial else []))
+
+    def finish(self):
+        self._add(json.loads(self.recognizer.FinalResult()).get('text', ''))
+        if not self.utterances:
+            raise sr.UnknownValueError()
+        return ' '.join(self.utterances)
+
+    def _add(self, text):
+        if text:
+            self.utterances.append(text)
+
+
+# Runs a streaming session on its own thread so recognition keeps up with the
+# recording instead of starting after it. feed() takes audio blocks from the
+# recorder, `partial` holds the transcript so far, and after close() the
+# final transcript is in `text` (or the exception in `error`) once `finished`
+# is set. cancel() is close() for a transcript nobody wants any more: the
+# audio still queued is dropped and `error` is a CancelledError.
+class StreamingTranscriber:
+    def __init__(self, session):
+        self.session = session
+        self.partial = ''
+        self.text = None
+        self.error = None
+        self.finished = threading.Event()
+        self._blocks = queue.Queue()
+        threading.Thread(target=self._run, name='asr-stream', daemon=True).start()
+
+    def feed(self, block):
+        self._blocks.put(block)
+
+    def close(self):
+        self._blocks.put(None)
+
+    def cancel(self):
+        if self.error is None:
+            self.error = CancelledError()
+        self.close()
+
+    def _run(self):
+        # After an error (or cancel()) the queue is still drained until close()
+        while True:
+            block = self._blocks.get()
+            if block is None:
+                break
+            if self.error is None:
+                try:
+                    with span('asr.accept'):
+                        self.partial = self.session.accept(block.data)
+                except Exception as e:
+                    self.error = e
+        if self.error is None:
+            try:
+                with span('asr.finish'):
+                    self.text = self.session.finish()
+            except Exception as e:
+                self.error = e
+        self.finished.set()
+
+
+# Splits the audio at pauses (see vad.py) and sends each speech segment to
+# backend.transcribe on a thread pool as soon as it is complete, so most of a
+# long answer is recognized while the student is still talking and only the
+# last segment is left when recording stops. Segment texts are joined back in
+# order; segments the recognizer cannot make out are left out. Same fields as
+# StreamingTranscriber, with `partial` holding the finished leading segments;
+# cancel() also drops the segments still waiting for a worker.
+class SegmentedTranscription:
+    def __init__(self, backend, workers=SEGMENT_WORKERS, samplerate=SAMPLE_RATE):
+        self.backend = backend
+        self.samplerate = samplerate
+        self.segmenter = SpeechSegmenter(samplerate)
+        self.partial = ''
+        self.text = None
+        self.error = None
+        self.finished = threading.Event()
+        self._futures = []
+        self._cancelled = False
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asr-segment')
+        self._blocks = queue.Queue()
+        threading.Thread(target=self._run, name='asr-segmenter', daemon=True).start()
+
+    def feed(self, block):
+        self._blocks.put(block)
+
+    def close(self):
+        self._blocks.put(None)
+
+    def cancel(self):
+        self._cancelled = True
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.close()
+
+    def _submit(self, segments):
+        for segment in segments:
+            audio_data = sr.AudioData(segment.tobytes(), self.samplerate, SAMPLE_WIDTH)
+            future = self._pool.submit(self._transcribe, audio_data)
+            future.add_done_callback(self._update_partial)
+            self._futures.append(future)
+
+    def _transcribe(self, audio_data):
+        try:
+            with span('asr.recognize'):
+                return self.backend.transcribe(audio_data)
+        except sr.UnknownValueError:
+            return ''
+
+    def _update_partial(self, _):
+        texts = []
+        for future in list(self._futures):
+            if not future.done() or future.cancelled() or future.exception() is not None:
+                break
+            texts.append(future.result())
+        self.partial = ' '.join(text for text in texts if text)
+
+    def _run(self):
+        closed = False
+        try:
+            while True:
+                block = self._blocks.get()
+                if block is None:
+                    closed = True
+                    break
+                if self._cancelled:
+                    continue
+                with span('asr.segment'):
+                    segments = self.segmenter.feed(block)
+                self._submit(segments)
+            if self._cancelled:
+                raise CancelledError()
+            self._submit(self.segmenter.flush())
+            texts = [future.result() for future in self._futures]
+            text = ' '.join(text for text in texts if text)
+            if not text:
+                raise sr.UnknownValueError()
+            self.text = text
+        except Exception as e:
+            self.error = CancelledError() if self._cancelled else e
+            # Keep draining so the recorder is never blocked, until close()
+            while not closed and self._blocks.get() is not None:
+                pass
+        finally:
+            self._pool.shutdown(wait=False)
+            self.finished.set()
+
+
+# Segmented, parallel transcription of a finished recording
+def transcribe_recording(backend, audio_data, workers=SEGMENT_WORKERS):
+    transcription = SegmentedTranscription(backend, workers)
+    pcm = audio_data.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=SAMPLE_WIDTH)
+    transcription.feed(np.frombuffer(pcm, dtype=np.int16))
+    transcription.close()
+    return transcription
+
+
+def make_asr_backend(name=DEFAULT_ASR_BACKEND):
+    if name == 'google':
+        return GoogleBackend()
+    if name == 'vosk':
+        return VoskBackend()
+    raise ValueError(f"Unknown speech recognition backend '{name}', expected one of {', '.join(ASR_BACKENDS)}")
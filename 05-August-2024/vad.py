@@ -0,0 +1,124 @@
+from collections import deque
+
+import numpy as np
+
+from audio_capture import SAMPLE_RATE
+
+
+# Energy-based voice activity detection. Audio is cut into 30 ms frames and a
+# frame counts as speech when its RMS energy is well above the background
+# noise. The noise floor is a low percentile (noise_percentile) of the frame
+# energies over the last noise_window_s, taken on every frame, so it follows
+# the room while a segment is open and stays put through phrases of a few
+# seconds. The window starts out filled with a low floor (min_energy / ratio),
+# so an answer that begins with speech is not taken for background; until
+# real frames have pushed that out, steady noise above min_energy can open a
+# segment, which is why each segment is checked again when it ends.
+#
+# A segment ends after min_silence_ms of silence (or at max_segment_s, so one
+# long stretch of speech cannot hold everything back). Its frames are then
+# judged against the floor of the frames heard so far: background is trimmed,
+# the segment is split at any pause that shows up, and each part keeps
+# padding_ms of audio on either side. Parts with less than min_speech_ms of
+# speech are dropped as noise.
+#
+# feed() takes int16 samples as they are recorded and returns the segments
+# completed so far; flush() returns the ones still open at the end.
+class SpeechSegmenter:
+    def __init__(self, samplerate=SAMPLE_RATE, frame_ms=30, min_silence_ms=500, min_speech_ms=200, padding_ms=200,
+                 max_segment_s=20, ratio=3.0, min_energy=300.0, noise_window_s=8, noise_percentile=5):
+        self.frame = samplerate * frame_ms // 1000
+        self.min_silence = max(1, min_silence_ms // frame_ms)
+        self.min_speech = max(1, min_speech_ms // frame_ms)
+        self.padding = padding_ms // frame_ms
+        self.max_frames = max(1, int(max_segment_s * 1000) // frame_ms)
+        self.ratio = ratio
+        self.min_energy = min_energy
+        self.noise_percentile = noise_percentile
+        # Ring buffer of recent frame energies; `heard` counts the real ones
+        self._energies = np.full(max(1, int(noise_window_s * 1000) // frame_ms), min_energy / ratio, dtype=np.float32)
+        self._position = 0
+        self._heard = 0
+        self._pending = np.empty(0, dtype=np.int16)
+        self._before = deque(maxlen=self.padding)
+        self._segment = None
+        self._segment_energies = None
+        self._silent = 0
+
+    def feed(self, samples):
+        samples = np.concatenate([self._pending, np.asarray(samples, dtype=np.int16).reshape(-1)])
+        usable = len(samples) - len(samples) % self.frame
+        self._pending = samples[usable:]
+        frames = samples[:usable].reshape(-1, self.frame)
+        if not len(frames):
+            return []
+        energies = np.sqrt(np.mean(frames.astype(np.float32) ** 2, axis=1))
+        segments = []
+        for frame, energy in zip(frames, energies):
+            segments += self._step(frame, energy)
+        return segments
+
+    def flush(self):
+        segments = []
+        if self._segment is not None:
+            if len(self._pending):
+                self._segment.append(self._pending)
+                self._segment_energies.append(0.0)
+            segments = self._close()
+        self._pending = np.empty(0, dtype=np.int16)
+        self._before.clear()
+        return segments
+
+    # Energy a frame must exceed to count as speech. heard_only leaves out the
+    # initial low floor that has not been pushed out of the window yet.
+    def threshold(self, heard_only=False):
+        energies = self._energies
+        if heard_only and 0 < self._heard < len(energies):
+            energies = np.roll(energies, -self._position)[-self._heard:]
+        k = int(self.noise_percentile / 100 * (len(energies) - 1))
+        return max(self.min_energy, float(np.partition(energies, k)[k]) * self.ratio)
+
+    def _step(self, frame, energy):
+        self._energies[self._position] = energy
+        self._position = (self._position + 1) % len(self._energies)
+        self._heard = min(self._heard + 1, len(self._energies))
+        speech = energy > self.threshold()
+        if self._segment is None:
+            if not speech:
+                self._before.append((frame, energy))
+                return []
+            self._segment = [before for before, _ in self._before] + [frame]
+            self._segment_energies = [before for _, before in self._before] + [energy]
+            self._before.clear()
+            self._silent = 0
+            return []
+        self._segment.append(frame)
+        self._segment_energies.append(energy)
+        self._silent = 0 if speech else self._silent + 1
+        if self._silent >= self.min_silence or len(self._segment) >= self.max_frames:
+            return self._close()
+        return []
+
+    def _close(self):
+        frames, energies = self._segment, np.asarray(self._segment_energies)
+        self._segment = None
+        self._segment_energies = None
+        self._silent = 0
+        # If the heard frames are all speech so far (nothing quieter to compare
+        # with), the floor the segment was opened with stands
+        parts = self._parts(energies, self.threshold(heard_only=True)) or self._parts(energies, self.threshold())
+        return [np.concatenate(frames[max(0, part[0] - self.padding):part[-1] + 1 + self.padding]) for part in parts]
+
+    # Runs of speech frames, split where more than min_silence frames separate them
+    def _parts(self, energies, threshold):
+        voiced = np.flatnonzero(energies > threshold)
+        if not len(voiced):
+            return []
+        parts = np.split(voiced, np.flatnonzero(np.diff(voiced) > self.min_silence) + 1)
+        return [part for part in parts if len(part) >= self.min_speech]
+
+
+# All speech segments of a finished recording, in order
+def speech_segments(samples, samplerate=SAMPLE_RATE, **options):
+    segmenter = SpeechSegmenter(samplerate, **options)
+    return segmenter.feed(samples) + segmenter.flush()
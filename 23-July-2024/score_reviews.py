@@ -0,0 +1,78 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from sentiment_model import LABELS, MODEL_PATH, TOKENIZER_PATH, SentimentModel
+
+
+# Yield (review_id, review) pairs one at a time so large files are never held in memory
+def read_reviews(path, text_field, id_field):
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as file:
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    row = json.loads(line)
+                    yield row.get(id_field, line_number), row.get(text_field) or ''
+    else:
+        with open(path, 'r', newline='', encoding='utf-8') as file:
+            for row_number, row in enumerate(csv.DictReader(file), start=1):
+                yield row.get(id_field) or row_number, row.get(text_field) or ''
+
+
+# Score (review_id, review) pairs chunk by chunk; yields (review_id, label, probabilities)
+def score_stream(model, reviews, chunk_size=8192):
+    reviews = iter(reviews)
+    while True:
+        chunk = list(islice(reviews, chunk_size))
+        if not chunk:
+            return
+        probabilities = model.predict_proba([review for _, review in chunk])
+        for (review_id, _), row in zip(chunk, probabilities):
+            yield review_id, int(row.argmax()), row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a CSV or JSONL file of reviews with the saved sentiment LSTM.')
+    parser.add_argument('input', help='.csv or .jsonl file of reviews')
+    parser.add_argument('output', help='.csv or .jsonl file to write, or - for JSONL on stdout')
+    parser.add_argument('--text-field', default='Review')
+    parser.add_argument('--id-field', default='id', help='column/key holding the review id (defaults to the row number)')
+    parser.add_argument('--chunk-size', type=int, default=8192, help='reviews read, bucketed and scored together')
+    parser.add_argument('--batch-size', type=int, default=256, help='reviews per forward pass')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--tokenizer', default=TOKENIZER_PATH)
+    args = parser.parse_args()
+
+    model = SentimentModel(args.model, args.tokenizer, batch_size=args.batch_size)
+
+    if args.output == '-':
+        out = sys.stdout
+    else:
+        out = open(args.output, 'w', newline='', encoding='utf-8')
+    writer = csv.writer(out) if args.output.endswith('.csv') else None
+    if writer is not None:
+        writer.writerow(['id', 'label', 'sentiment'] + [f'p_{label}' for label in range(len(LABELS))])
+
+    start = time.perf_counter()
+    processed = 0
+    try:
+        for review_id, label, probabilities in score_stream(model, read_reviews(args.input, args.text_field, args.id_field), args.chunk_size):
+            if writer is not None:
+                writer.writerow([review_id, label, LABELS[label]] + [f'{value:.4f}' for value in probabilities])
+            else:
+                out.write(json.dumps({'id': review_id, 'label': label, 'sentiment': LABELS[label],
+                                      'probabilities': [round(float(value), 4) for value in probabilities]}) + '\n')
+            processed += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {processed} reviews in {elapsed:.1f}s ({processed / max(elapsed, 1e-9):.1f} reviews/sec)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(BASE_DIR, 'flipkart.csv')
+MODEL_PATH = os.path.join(BASE_DIR, 'sentiment_lstm.keras')
+TOKENIZER_PATH = os.path.join(BASE_DIR, 'sentiment_tokenizer.json')
+
+# Same settings as LSTM.ipynb
+NUM_WORDS = 5000
+MAXLEN = 200
+LABELS = ["Customer Not Satisfied", "Customer Partially Satisfied", "Customer Satisfied"]
+
+# Widths an unmasked model may opt into: reviews are padded to the smallest of
+# these lengths that fits them plus MIN_PADDING leading zeros (see SentimentModel)
+BUCKETS = (16, 24, 32, 48, 64, 96, 128, MAXLEN)
+MIN_PADDING = 16
+
+# Length boundaries the bucketed training pipeline groups reviews by
+TRAIN_BUCKETS = (16, 32, 64, 128)
+
+
+def label_rating(Rating):
+    if Rating >= 4:
+        return 2 # represents positive
+    elif Rating == 3:
+        return 1 # neutral
+    else:
+        return 0 # negative
+
+
+# maxlen=None accepts any sequence length; the weights are the same either
+# way. With mask_zero the LSTM skips padding, so the amount of padding no
+# longer changes the prediction (used for models trained on dynamic padding).
+def build_model(maxlen=MAXLEN, mask_zero=False):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense, Embedding, Input, LSTM
+    model = Sequential()
+    model.add(Input(shape=(maxlen,), dtype='int32'))
+    model.add(Embedding(input_dim=NUM_WORDS, output_dim=128, mask_zero=mask_zero))
+    model.add(LSTM(units=128, dropout=0.2, recurrent_dropout=0.2))
+    model.add(Dense(units=3, activation='softmax'))
+    model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+    return model
+
+
+# tf.data pipeline over token sequences of any length. Reviews are grouped by
+# length (TRAIN_BUCKETS) and every batch is padded only to its longest
+# review, instead of all of them to MAXLEN; batches are prefetched so the
+# next one is ready while the model works on the current one. labels are
+# one-hot rows, or None for inference.
+def make_dataset(sequences, labels=None, batch_size=32, shuffle=False, seed=42):
+    import tensorflow as tf
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
+    lengths = np.array([min(len(sequence), MAXLEN) for sequence in sequences], dtype=np.int32)
+    padded = pad_sequences(sequences, maxlen=MAXLEN, dtype='int32')
+    # Each element is cut back to its own tokens (pad_sequences pads in front)
+    if labels is None:
+        dataset = tf.data.Dataset.from_tensor_slices((padded, lengths))
+        trim = lambda x, n: x[MAXLEN - n:]
+    else:
+        dataset = tf.data.Dataset.from_tensor_slices((padded, lengths, labels))
+        trim = lambda x, n, y: (x[MAXLEN - n:], y)
+    if shuffle:
+        dataset = dataset.shuffle(len(lengths), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.map(trim, num_parallel_calls=tf.data.AUTOTUNE)
+    length = (lambda x: tf.shape(x)[0]) if labels is None else (lambda x, y: tf.shape(x)[0])
+    dataset = dataset.bucket_by_sequence_length(
+        length, bucket_boundaries=list(TRAIN_BUCKETS), bucket_batch_sizes=[batch_size] * (len(TRAIN_BUCKETS) + 1))
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+# The notebook's training run: fit the Tokenizer on every review, hold out 20%
+# for testing, train for `epochs`. Returns the model, the tokenizer and the
+# test accuracy.
+#
+# bucketed=True trains a masked model on the make_dataset pipeline instead of
+# 200-token pad_sequences arrays. The split is the same, and the last 20% of
+# the training rows are used for validation, as validation_split does.
+def train(csv_path=DATA_PATH, epochs=10, batch_size=32, bucketed=False, callbacks=None):
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from tensorflow.keras.preprocessing.text import Tokenizer
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
+    from tensorflow.keras.utils import to_categorical
+
+    df = pd.read_csv(csv_path)
+    df['labels'] = df['Rating'].apply(label_rating)
+    tokenizer = Tokenizer(num_words=NUM_WORDS)
+    tokenizer.fit_on_texts(df['Review'])
+    sequences = tokenizer.texts_to_sequences(df['Review'])
+    labels = to_categorical(df['labels'], num_classes=3)
+
+    train_rows, test_rows = train_test_split(list(range(len(df))), test_size=0.2, random_state=42)
+    if not bucketed:
+        data = pad_sequences(sequences, maxlen=MAXLEN)
+        model = build_model()
+        model.fit(data[train_rows], labels[train_rows], epochs=epochs, batch_size=batch_size, validation_split=0.2,
+                  callbacks=callbacks)
+        _, accuracy = model.evaluate(data[test_rows], labels[test_rows])
+        return model, tokenizer, accuracy
+
+    validation_start = int(len(train_rows) * 0.8)
+    fit_rows, validation_rows = train_rows[:validation_start], train_rows[validation_start:]
+    subset = lambda rows: ([sequences[row] for row in rows], labels[rows])
+    model = build_model(maxlen=None, mask_zero=True)
+    model.fit(make_dataset(*subset(fit_rows), batch_size=batch_size, shuffle=True), epochs=epochs,
+              validation_data=make_dataset(*subset(validation_rows), batch_size=batch_size), callbacks=callbacks)
+    _, accuracy = model.evaluate(make_dataset(*subset(test_rows), batch_size=batch_size))
+    return model, tokenizer, accuracy
+
+
+def save(model, tokenizer, model_path=MODEL_PATH, tokenizer_path=TOKENIZER_PATH):
+    model.save(model_path)
+    with open(tokenizer_path, 'w', encoding='utf-8') as file:
+        file.write(tokenizer.to_json())
+
+
+# Loads the saved LSTM and its fitted Tokenizer for scoring many reviews.
+# Reviews are sorted by token count and batched, so each batch holds reviews
+# of similar length and is padded only as far as they need instead of to 200.
+# Batches run through a compiled forward pass (calling the model directly,
+# without predict()'s per-call setup). Padding and truncation match
+# pad_sequences: zeros in front, and the last MAXLEN tokens are kept.
+#
+# Models trained on the bucketed pipeline mask the padding, so each batch is
+# padded just to its longest review and the result does not depend on it.
+# The notebook's model has no mask and the LSTM reads the leading zeros, so by
+# default it gets the full 200-token input and matches the notebook exactly.
+# Passing buckets=BUCKETS pads it only to the smallest bucket that leaves
+# min_padding zeros: faster, but approximate (on 3-epoch models, 2 of the
+# 2304 flipkart.csv labels changed and probabilities moved by up to 0.03;
+# benchmarks/sentiment.py --short-buckets measures it).
+class SentimentModel:
+    def __init__(self, model_path=MODEL_PATH, tokenizer_path=TOKENIZER_PATH, buckets=None, min_padding=MIN_PADDING,
+                 batch_size=256):
+        import tensorflow as tf
+        from tensorflow.keras.models import load_model
+        from tensorflow.keras.preprocessing.text import tokenizer_from_json
+
+        with open(tokenizer_path, 'r', encoding='utf-8') as file:
+            self.tokenizer = tokenizer_from_json(file.read())
+        saved = load_model(model_path)
+        self.masked = bool(saved.layers[0].mask_zero)
+        # Same weights in a model that takes any sequence length
+        self.model = build_model(maxlen=None, mask_zero=self.masked)
+        self.model.set_weights(saved.get_weights())
+        if buckets is None:
+            buckets = BUCKETS if self.masked else (MAXLEN,)
+        self.buckets = tuple(sorted(buckets))
+        self.maxlen = self.buckets[-1]
+        self.min_padding = min_padding
+        self.batch_size = batch_size
+        # One trace serves every width and batch size
+        self._forward = tf.function(lambda x: self.model(x, training=False),
+                                    input_signature=[tf.TensorSpec([None, None], tf.int32)])
+
+    def sequences(self, texts):
+        return self.tokenizer.texts_to_sequences(texts)
+
+    # Padded length for a batch whose longest review has `longest` tokens
+    def width(self, longest):
+        if self.masked:
+            return max(int(longest), 1)
+        return self.buckets[np.searchsorted(self.buckets, min(longest + self.min_padding, self.maxlen))]
+
+    # (len(texts), 3) class probabilities, rows in input order
+    def predict_proba(self, texts):
+        sequences = [sequence[-self.maxlen:] for sequence in self.sequences(texts)]
+        probabilities = np.empty((len(sequences), len(LABELS)), dtype=np.float32)
+        if not sequences:
+            return probabilities
+        lengths = np.array([len(sequence) for sequence in sequences])
+        order = np.argsort(lengths, kind='stable')
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            padded = np.zeros((len(batch), self.width(lengths[batch].max())), dtype=np.int32)
+            for row, position in enumerate(batch):
+                sequence = sequences[position]
+                if sequence:
+                    padded[row, -len(sequence):] = sequence
+            probabilities[batch] = self._forward(padded).numpy()
+        return probabilities
+
+    def predict(self, texts):
+        return self.predict_proba(texts).argmax(axis=1)
+
+    # Drop-in for the notebook's predict_user_input
+    def predict_user_input(self, text):
+        return LABELS[int(self.predict([text])[0])]
@@ -0,0 +1,23 @@
+import argparse
+
+from sentiment_model import DATA_PATH, MODEL_PATH, TOKENIZER_PATH, save, train
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the review sentiment LSTM (as in LSTM.ipynb) and save it with its tokenizer.')
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--tokenizer', default=TOKENIZER_PATH)
+    parser.add_argument('--bucketed', action='store_true',
+                        help='train a masked model on length-bucketed batches instead of 200-token padding')
+    args = parser.parse_args()
+
+    model, tokenizer, accuracy = train(args.data, args.epochs, args.batch_size, bucketed=args.bucketed)
+    save(model, tokenizer, args.model, args.tokenizer)
+    print(f"Test accuracy {accuracy:.4f}; saved {args.model} and {args.tokenizer}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from fir_suggester import CANDIDATES, SectionSuggester
+
+OUTPUT_FIELDS = ['Index', 'Score', 'Offense', 'Punishment', 'Cognizable', 'Bailable', 'Court']
+
+
+# Yield (complaint_id, complaint) pairs one at a time so large files are never held in memory
+def read_complaints(path, text_field, id_field):
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as file:
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    row = json.loads(line)
+                    yield row.get(id_field, line_number), row[text_field]
+    else:
+        with open(path, 'r', newline='', encoding='utf-8') as file:
+            for row_number, row in enumerate(csv.DictReader(file), start=1):
+                yield row.get(id_field) or row_number, row[text_field]
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class JsonlWriter:
+    def __init__(self, file, fields):
+        self.file = file
+        self.fields = fields
+
+    def write(self, complaint_id, complaint, suggestions):
+        suggestions = [{field: suggestion[field] for field in self.fields} for suggestion in suggestions]
+        self.file.write(json.dumps({'id': complaint_id, 'complaint': complaint, 'suggestions': suggestions}) + '\n')
+
+
+# One output row per suggested section
+class CsvWriter:
+    def __init__(self, file, fields):
+        self.writer = csv.writer(file)
+        self.writer.writerow(['id', 'rank'] + fields)
+        self.fields = fields
+
+    def write(self, complaint_id, complaint, suggestions):
+        for rank, suggestion in enumerate(suggestions, start=1):
+            self.writer.writerow([complaint_id, rank] + [suggestion[field] for field in self.fields])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Suggest IPC sections for a CSV or JSONL file of complaints.')
+    parser.add_argument('input', help='.csv or .jsonl file of complaints')
+    parser.add_argument('output', help='.jsonl or .csv file to write, or - for JSONL on stdout')
+    parser.add_argument('--text-field', default='complaint', help='column/key holding the complaint text')
+    parser.add_argument('--id-field', default='id', help='column/key holding the complaint id (defaults to the row number)')
+    parser.add_argument('--batch-size', type=int, default=256, help='complaints encoded and scored together')
+    parser.add_argument('--min-suggestions', type=int, default=5)
+    parser.add_argument('--max-suggestions', type=int, default=None, help='cap the number of sections written per complaint')
+    parser.add_argument('--fields', default=','.join(OUTPUT_FIELDS), help='comma separated section fields to write')
+    parser.add_argument('--backend', default=None, help='retrieval backend (exact or ivf)')
+    parser.add_argument('--candidates', type=int, default=CANDIDATES,
+                        help='sections the backend returns per complaint; ivf is only used when this is set')
+    parser.add_argument('--nlist', type=int, default=None, help='ivf clusters (default: 4 * sqrt(sections))')
+    parser.add_argument('--nprobe', type=int, default=None, help='ivf clusters scanned per complaint')
+    parser.add_argument('--inference-backend', default=None, help='embedding model inference (fp32, int8 or onnx)')
+    parser.add_argument('--embedding-server', default=None, help='URL of a shared embedding server to use instead of loading the model')
+    parser.add_argument('--cache-size', type=int, default=10000, help='distinct complaints remembered (0 disables the cache)')
+    args = parser.parse_args()
+
+    fields = args.fields.split(',')
+    options = {'cache_size': args.cache_size}
+    if args.backend is not None:
+        options['backend'] = args.backend
+    if args.nlist is not None:
+        options['nlist'] = args.nlist
+    if args.nprobe is not None:
+        options['nprobe'] = args.nprobe
+    if args.inference_backend is not None:
+        options['inference_backend'] = args.inference_backend
+    if args.embedding_server is not None:
+        options['embedding_server'] = args.embedding_server
+    suggester = SectionSuggester(**options)
+
+    if args.output == '-':
+        out = sys.stdout
+    else:
+        out = open(args.output, 'w', newline='', encoding='utf-8')
+    writer = CsvWriter(out, fields) if args.output.endswith('.csv') else JsonlWriter(out, fields)
+
+    start = time.perf_counter()
+    processed = 0
+    try:
+        for batch in batches(read_complaints(args.input, args.text_field, args.id_field), args.batch_size):
+            results = suggester.suggest_many([complaint for _, complaint in batch], args.min_suggestions, args.candidates,
+                                             batch_size=min(args.batch_size, 64), max_suggestions=args.max_suggestions)
+            for (complaint_id, complaint), suggestions in zip(batch, results):
+                writer.write(complaint_id, complaint, suggestions)
+            out.flush()
+            processed += len(batch)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {processed} complaints in {elapsed:.1f}s ({processed / max(elapsed, 1e-9):.1f}/s)", file=sys.stderr)
+    print(f"Cache: {suggester.cache.stats()}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BASE_DIR))
+
+from common.text_preprocessing import default_workers, preprocess_many
+
+COLUMNS = ['Description', 'Offense', 'Punishment', 'Cognizable', 'Bailable', 'Court', 'Combo']
+
+
+# Same steps as fir_project.ipynb: fill gaps, join Description and Offense, preprocess
+def build_dataset(csv_path, workers=None):
+    ds = pd.read_csv(csv_path)
+    ds.fillna("Not Mentioned", inplace=True)
+    combo = ds['Description'] + ds['Offense']
+    ds['Combo'] = preprocess_many(combo.tolist(), 'stem', workers)
+    return ds[COLUMNS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild preprocess_data.pkl from FIR-DATA.csv.')
+    parser.add_argument('--csv', default=os.path.join(BASE_DIR, 'FIR-DATA.csv'))
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'preprocess_data.pkl'))
+    parser.add_argument('--workers', type=int, default=default_workers(), help='preprocessing processes (1 = no pool)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    new_ds = build_dataset(args.csv, args.workers)
+    with open(args.output, 'wb') as file:
+        pickle.dump(new_ds, file)
+    print(f"Wrote {len(new_ds)} sections to {args.output} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,60 +1,60 @@
-import re
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
-import pandas as pd
-import pickle
-from sentence_transformers import SentenceTransformer, util
+import os
+import sys
 from tkinter import Tk, Label, Entry, Text, Button, Scrollbar, RIGHT, Y, END, Frame
 from tkinter import ttk
-from threading import Thread
-import time
-
-# Preprocess function
-def preprocess_text(text):
-    text = text.lower()
-    words = word_tokenize(text)
-    stop_words = set(stopwords.words('english'))
-    words = [word for word in words if word not in stop_words]
-    stemmer = PorterStemmer()
-    words = [stemmer.stem(word) for word in words]
-    preprocessed_text = ' '.join(words)
-    return preprocessed_text
-
-# Load preprocessed data and model
-new_ds = pickle.load(open('preprocess_data.pkl', 'rb'))
-model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-
-# Suggest sections function
-def suggest_sections(complaint, dataset, min_suggestions=5):
-    preprocessed_complaint = preprocess_text(complaint)
-    complaint_embedding = model.encode(preprocessed_complaint)
-    section_embedding = model.encode(dataset['Combo'].tolist())
-    similarities = util.pytorch_cos_sim(complaint_embedding, section_embedding)[0]
-    similarity_threshold = 0.2
-    relevant_indices = []
-    while len(relevant_indices) < min_suggestions and similarity_threshold > 0:
-        relevant_indices = [i for i, sim in enumerate(similarities) if sim > similarity_threshold]
-        similarity_threshold -= 0.05
-    sorted_indices = sorted(relevant_indices, key=lambda i: similarities[i], reverse=True)
-    suggestions = dataset.iloc[sorted_indices][['Description', 'Offense', 'Punishment', 'Cognizable', 'Bailable', 'Court', 'Combo']].to_dict(orient='records')
-    return suggestions
-
-# Function to run the suggestion generation in a separate thread
-def process_suggestions():
-    complaint = complaint_entry.get()
-    show_loading_animation()
-    # Simulate a delay for demonstration purposes
-    time.sleep(2)
-    suggestions = suggest_sections(complaint, new_ds)
+from threading import Thread, Event
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from fir_suggester import SectionSuggester, CACHE_PATH, CANDIDATES
+from common import stage_timing, startup_probe
+from common.tk_tasks import TaskRunner
+
+# The data, model and section index load in a background thread so the window
+# appears straight away; suggester_ready is set once loading has finished
+suggester = None
+suggester_ready = Event()
+load_error = None
+
+def load_suggester():
+    global suggester, load_error
+    try:
+        # Recent results persist across restarts
+        loaded = SectionSuggester(cache_path=CACHE_PATH)
+        loaded.encode('warm up')  # First forward pass is slow, get it out of the way
+        suggester = loaded
+    except Exception as e:
+        load_error = e
+    finally:
+        suggester_ready.set()
+
+# Poll from the Tk thread until the background load is done, then enable the UI
+def check_ready():
+    if not suggester_ready.is_set():
+        root.after(100, check_ready)
+        return
+    if load_error is not None:
+        status_label.config(text=f"Could not load the model: {load_error}", fg='#ff4500')
+        return
+    status_label.config(text="Model ready")
+    suggest_button.config(state='normal')
+    startup_probe.run_first_result(root, suggester.suggest_sections, 'theft of mobile phone', 5, CANDIDATES)
+
+# Called on the Tk thread once the suggestions are ready
+def show_suggestions(suggestions):
+    with stage_timing.span('fir.render'):
+        hide_loading_animation()
+        update_output_text(suggestions)
+
+def show_error(error):
     hide_loading_animation()
-    update_output_text(suggestions)
+    output_text.delete("1.0", END)
+    output_text.insert(END, f"Could not get suggestions: {error}")
 
 # Function to show loading animation
 def show_loading_animation():
     loading_frame.pack(pady=10)  # Show the loading frame
     progress_bar.start()
-    root.update_idletasks()  # Update the GUI
 
 # Function to hide loading animation
 def hide_loading_animation():
@@ -85,13 +85,32 @@ def update_output_text(suggestions):
     else:
         output_text.insert(END, "No record is found")
 
+# Save the result cache so the next start is warm
+def on_close():
+    tasks.shutdown()
+    if suggester is not None:
+        suggester.cache.save()
+        print(f"Suggestion cache: {suggester.cache.stats()}")
+    if stage_timing.is_enabled():
+        print(stage_timing.log_line())
+    root.destroy()
+
 # Function to handle the button click
 def on_suggest_button_click():
-    # Run the suggestion generation in a separate thread to avoid blocking the GUI
-    Thread(target=process_suggestions).start()
+    # Clicking again for the same complaint keeps the job already running;
+    # a different complaint replaces it
+    show_loading_animation()
+    tasks.submit(suggester.suggest_sections, complaint_entry.get(), 5, CANDIDATES, key='suggest',
+                 on_done=show_suggestions, on_error=show_error)
 
 root = Tk()
+# Suggestions are computed off the Tk thread and handed back to it
+tasks = TaskRunner(root)
 root.title("IPC Section Suggestions")
+root.protocol("WM_DELETE_WINDOW", on_close)
+# Ctrl+Alt+T toggles per-stage timing, Ctrl+Alt+P profiles the next suggestion
+stage_timing.bind_keys(root)
+stage_timing.start_exporter()
 
 # Create a main frame with background color
 main_frame = Frame(root, padx=20, pady=20, bg='#f0f8ff')  # Light AliceBlue background
@@ -101,6 +120,10 @@ main_frame.pack(expand=True, fill='both')
 header_label = Label(main_frame, text="IPC Section Suggestions", font=('Helvetica', 18, 'bold'), bg='#f0f8ff', fg='#4682b4')  # SteelBlue color
 header_label.pack(pady=10)
 
+# Model loading status
+status_label = Label(main_frame, text="Loading model...", font=('Helvetica', 12, 'italic'), bg='#f0f8ff', fg='#4682b4')
+status_label.pack()
+
 # Crime Description Entry
 complaint_label = Label(main_frame, text='Enter crime description:', font=('Helvetica', 14), bg='#f0f8ff', fg='#4682b4')
 complaint_label.pack(pady=5)
@@ -109,7 +132,7 @@ complaint_entry = Entry(main_frame, width=80, font=('Helvetica', 14), bd=2, reli
 complaint_entry.pack(pady=5)
 
 # Suggest Button
-suggest_button = Button(main_frame, text='Get Suggestions', command=on_suggest_button_click, font=('Helvetica', 14, 'bold'), bg='#20b2aa', fg='white', bd=0, relief='flat')
+suggest_button = Button(main_frame, text='Get Suggestions', command=on_suggest_button_click, font=('Helvetica', 14, 'bold'), bg='#20b2aa', fg='white', bd=0, relief='flat', state='disabled')
 suggest_button.pack(pady=10)
 
 # Loading Animation
@@ -135,4 +158,8 @@ scrollbar.config(command=output_text.yview)
 # Configure text tags
 output_text.tag_configure('bold', font=('Helvetica', 12, 'bold'))
 
+Thread(target=load_suggester, daemon=True).start()
+root.after(100, check_ready)
+startup_probe.watch_window(root)
+
 root.mainloop()
@@ -0,0 +1,131 @@
+import os
+import sys
+
+import numpy as np
+
+from section_index import load_or_build_index, select_relevant
+from retrieval import ExactSearch, make_backend
+from suggestion_cache import SuggestionCache
+from section_store import load_sections
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BASE_DIR))
+
+from common.embedding_server import DEFAULT_SERVER, EmbeddingClient, RemoteSentenceTransformer
+from common.inference_backend import DEFAULT_BACKEND, load_sentence_transformer
+from common.stage_timing import request, span
+from common.text_preprocessing import get_preprocessor
+
+DATA_PATH = os.path.join(BASE_DIR, 'preprocess_data.pkl')
+STORE_DIR = os.path.join(BASE_DIR, 'section_store')
+INDEX_PATH = os.path.join(BASE_DIR, 'section_index.npy')
+META_PATH = os.path.join(BASE_DIR, 'section_index.json')
+IVF_PATH = os.path.join(BASE_DIR, 'section_index.ivf.npz')
+CACHE_PATH = os.path.join(BASE_DIR, 'suggestion_cache.pkl')
+
+MODEL_NAME = 'paraphrase-MiniLM-L6-v2'
+# 'exact' scans every section; 'ivf' is approximate and only scans nearby
+# clusters, so it is only used when a number of candidates is asked for:
+# candidates=None means every section above the relevance floor, which only an
+# exact scan can give. FIR_CANDIDATES sets the count the GUI asks for, and
+# FIR_IVF_NLIST / FIR_IVF_NPROBE tune the clusters.
+RETRIEVAL_BACKEND = os.environ.get('FIR_RETRIEVAL_BACKEND', 'exact')
+CANDIDATES = int(os.environ['FIR_CANDIDATES']) if os.environ.get('FIR_CANDIDATES') else None
+IVF_NLIST = int(os.environ['FIR_IVF_NLIST']) if os.environ.get('FIR_IVF_NLIST') else None
+IVF_NPROBE = int(os.environ.get('FIR_IVF_NPROBE', 8))
+
+DISPLAY_COLUMNS = ['Description', 'Offense', 'Punishment', 'Cognizable', 'Bailable', 'Court', 'Combo']
+
+
+# Same lowercase / stop word / Porter stem pipeline used to build the Combo column
+def preprocess_text(text):
+    return get_preprocessor('stem')(text)
+
+
+class SectionSuggester:
+    def __init__(self, data_path=DATA_PATH, model_name=MODEL_NAME, backend=RETRIEVAL_BACKEND,
+                 cache_size=1024, cache_path=None, inference_backend=DEFAULT_BACKEND, embedding_server=DEFAULT_SERVER,
+                 store_dir=STORE_DIR, index_path=INDEX_PATH, meta_path=META_PATH, ivf_path=IVF_PATH,
+                 nlist=IVF_NLIST, nprobe=IVF_NPROBE):
+        # Load preprocessed data (memory-mapped columnar copy of the pickle) and model
+        self.sections = load_sections(store_dir, data_path)
+        # Quantized/ONNX models give slightly different vectors, so they get their own index
+        self.model_name = model_name if inference_backend == 'fp32' else f'{model_name}-{inference_backend}'
+        if embedding_server:
+            # Complaints are embedded by the shared server instead of a model loaded here
+            self.model = RemoteSentenceTransformer(EmbeddingClient(embedding_server), model_name, inference_backend)
+        else:
+            self.model = load_sentence_transformer(model_name, inference_backend)
+
+        # Section embeddings are computed once and cached on disk next to the pickle
+        self.index = load_or_build_index(self.model, self.model_name, self.sections.column('Combo'), index_path, meta_path)
+        # The IVF clusters are trained once per model and corpus and saved next to the index
+        options = {}
+        if backend == 'ivf':
+            options = {'nlist': nlist, 'nprobe': nprobe, 'path': ivf_path,
+                       'fingerprint': f"{self.model_name}:{self.index.fingerprint}"}
+        self.backend = make_backend(backend, self.index.embeddings, **options)
+        self.exact = self.backend if isinstance(self.backend, ExactSearch) else ExactSearch(self.index.embeddings)
+
+        # Results are cached per preprocessed complaint and dropped whenever the index changes
+        self.cache = SuggestionCache(cache_size, cache_path)
+        fingerprint = f"{self.model_name}:{self.index.fingerprint}:{self.backend.name}"
+        if backend == 'ivf':
+            fingerprint += f":{self.backend.nlist}:{self.backend.nprobe}"
+        self.cache.bind(fingerprint)
+
+    def encode(self, texts, batch_size=64):
+        embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(embeddings, dtype=np.float32)
+
+    # Stages are timed when common/stage_timing is on; fir.encode covers both
+    # the model's tokenizer and its forward pass. max_suggestions caps the
+    # sections returned, and so the size of the cached entry.
+    def suggest_sections(self, complaint, min_suggestions=5, candidates=None, max_suggestions=None):
+        with request('fir.suggest_sections'):
+            with span('fir.preprocess'):
+                preprocessed_complaint = preprocess_text(complaint)
+            key = (preprocessed_complaint, min_suggestions, candidates, max_suggestions)
+            ranked = self.cache.get(key)
+            if ranked is None:
+                with span('fir.encode'):
+                    complaint_embedding = self.encode(preprocessed_complaint)
+                with span('fir.search'):
+                    candidate_indices, similarities = self._searcher(candidates).search(complaint_embedding, candidates)
+                with span('fir.rank'):
+                    ranked = self._rank(candidate_indices, similarities, min_suggestions, max_suggestions)
+                self.cache.put(key, ranked)
+            with span('fir.records'):
+                return self._records(*ranked)
+
+    # Suggestions for many complaints: repeated complaints are looked up once,
+    # and the distinct ones that miss the cache are encoded in batches, each
+    # batch scored against the sections in one matrix product
+    def suggest_many(self, complaints, min_suggestions=5, candidates=None, batch_size=64, max_suggestions=None):
+        keys = [(text, min_suggestions, candidates, max_suggestions) for text in get_preprocessor('stem').preprocess_many(complaints)]
+        ranked = {key: self.cache.get(key) for key in dict.fromkeys(keys)}
+        missing = [key for key, result in ranked.items() if result is None]
+        if missing:
+            complaint_embeddings = self.encode([key[0] for key in missing], batch_size)
+            searcher = self._searcher(candidates)
+            for key, (candidate_indices, similarities) in zip(missing, searcher.search_batch(complaint_embeddings, candidates)):
+                ranked[key] = self._rank(candidate_indices, similarities, min_suggestions, max_suggestions)
+                self.cache.put(key, ranked[key])
+        return [self._records(*ranked[key]) for key in keys]
+
+    def _searcher(self, candidates):
+        return self.exact if candidates is None else self.backend
+
+    # Copies, so a cached entry does not keep the full score array alive
+    def _rank(self, candidate_indices, similarities, min_suggestions, max_suggestions=None):
+        selected, scores = select_relevant(similarities, min_suggestions)
+        selected, scores = selected[:max_suggestions], scores[:max_suggestions]
+        return candidate_indices[selected].astype(np.int32), scores.copy()
+
+    def _records(self, sorted_indices, scores):
+        # Display fields are only read for the rows being returned
+        suggestions = self.sections.records(sorted_indices, DISPLAY_COLUMNS)
+        for suggestion, index, score in zip(suggestions, sorted_indices, scores):
+            suggestion['Index'] = int(index)
+            suggestion['Score'] = float(score)
+        return suggestions
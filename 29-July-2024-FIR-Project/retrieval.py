@@ -0,0 +1,208 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+
+# Positions of the k largest scores, best first
+def top_k(scores, k):
+    if k is None or k >= scores.shape[0]:
+        return np.argsort(-scores, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind='stable')]
+
+
+# Brute-force cosine search over L2-normalised embeddings
+class ExactSearch:
+    name = 'exact'
+
+    def __init__(self, embeddings):
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def search(self, query, k=None):
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        scores = self.embeddings @ query
+        if k is None:
+            # Every section, in corpus order; callers rank them themselves
+            return np.arange(scores.shape[0]), scores
+        ids = top_k(scores, k)
+        return ids, scores[ids]
+
+    # One matrix product scores the whole batch of queries against every section
+    def search_batch(self, queries, k=None):
+        scores = np.asarray(queries, dtype=np.float32) @ self.embeddings.T
+        if k is None:
+            ids = np.arange(scores.shape[1])
+            return [(ids, row) for row in scores]
+        results = []
+        for row in scores:
+            best = top_k(row, k)
+            results.append((best, row[best]))
+        return results
+
+
+# Inverted-file index: sections are clustered with spherical k-means and a query
+# is only compared against the members of its nprobe closest clusters.
+#   nlist  - number of clusters; more clusters means smaller lists to scan
+#   nprobe - clusters visited per query; higher is slower but gives better recall
+# With a path, the trained centroids and lists are saved there and reused while
+# the fingerprint (model and corpus), nlist and seed still match.
+class IVFSearch:
+    name = 'ivf'
+
+    def __init__(self, embeddings, nlist=None, nprobe=8, iterations=10, train_size=None, seed=0, path=None, fingerprint=None):
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        count = self.embeddings.shape[0]
+        if nlist is None:
+            nlist = max(1, int(4 * np.sqrt(count)))
+        self.nlist = max(1, min(nlist, count))
+        self.nprobe = nprobe
+        key = f"{fingerprint}:{count}:{self.nlist}:{seed}"
+        if path and self.load(path, key):
+            return
+
+        rng = np.random.default_rng(seed)
+        if train_size is None:
+            train_size = 256 * self.nlist
+        if train_size < count:
+            sample = self.embeddings[rng.choice(count, train_size, replace=False)]
+        else:
+            sample = self.embeddings
+        self.centroids = _spherical_kmeans(sample, self.nlist, iterations, rng)
+
+        assignment = _assign(self.embeddings, self.centroids)
+        self.list_ids = np.argsort(assignment, kind='stable')
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=self.nlist))))
+        if path:
+            self.save(path, key)
+
+    def load(self, path, key):
+        try:
+            with np.load(path) as saved:
+                if str(saved['key']) != key:
+                    return False
+                self.centroids = saved['centroids']
+                self.list_ids = saved['list_ids']
+                self.list_offsets = saved['list_offsets']
+        except (OSError, KeyError, ValueError):
+            return False
+        return True
+
+    def save(self, path, key):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, key=np.array(key), centroids=self.centroids, list_ids=self.list_ids, list_offsets=self.list_offsets)
+        os.replace(tmp_path, path)
+
+    def search(self, query, k=10, nprobe=None):
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        probe = top_k(self.centroids @ query, nprobe or self.nprobe)
+        ids = np.concatenate([self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probe])
+        scores = self.embeddings[ids] @ query
+        best = top_k(scores, k)
+        return ids[best], scores[best]
+
+    def search_batch(self, queries, k=10, nprobe=None):
+        return [self.search(query, k, nprobe) for query in queries]
+
+
+BACKENDS = {
+    'exact': ExactSearch,
+    'ivf': IVFSearch,
+}
+
+
+def make_backend(name, embeddings, **options):
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown retrieval backend '{name}', expected one of {sorted(BACKENDS)}")
+    return backend(embeddings, **options)
+
+
+# Nearest centroid for every vector, in chunks so memory stays bounded on large corpora
+def _assign(vectors, centroids, chunk_size=8192):
+    assignment = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], chunk_size):
+        assignment[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+    return assignment
+
+
+def _spherical_kmeans(vectors, nlist, iterations, rng):
+    centroids = vectors[rng.choice(vectors.shape[0], nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _assign(vectors, centroids)
+        order = np.argsort(assignment, kind='stable')
+        counts = np.bincount(assignment, minlength=nlist)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        sums = np.add.reduceat(vectors[order], starts[filled], axis=0)
+        centroids[filled] = sums
+        # Re-seed empty clusters with random vectors so no list stays unused
+        empty = np.flatnonzero(~filled)
+        if empty.size:
+            centroids[empty] = vectors[rng.choice(vectors.shape[0], empty.size, replace=False)]
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+# Fraction of the exact top-k that the approximate backend also returns
+def recall_at_k(approximate, exact, queries, k=10):
+    hits = 0
+    for query in queries:
+        expected, _ = exact.search(query, k)
+        found, _ = approximate.search(query, k)
+        hits += np.intersect1d(expected, found).size
+    return hits / (len(queries) * k)
+
+
+# Queries are perturbed copies of corpus vectors so the check needs no model
+def _sample_queries(embeddings, count, noise, rng):
+    picks = embeddings[rng.choice(embeddings.shape[0], count, replace=embeddings.shape[0] < count)]
+    queries = picks + rng.normal(scale=noise, size=picks.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+# Mean milliseconds per query
+def _latency(backend, queries, k):
+    start = time.perf_counter()
+    for query in queries:
+        backend.search(query, k)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure recall@k and latency of the IVF backend against exact search.')
+    parser.add_argument('--index', default='section_index.npy', help='saved section embedding matrix')
+    parser.add_argument('--scale', type=int, default=1, help='upscale the corpus with jittered copies to simulate a larger index')
+    parser.add_argument('--nlist', type=int, default=None)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--noise', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    embeddings = np.load(args.index)
+    if args.scale > 1:
+        embeddings = _sample_queries(embeddings, embeddings.shape[0] * args.scale, args.noise, rng)
+    queries = _sample_queries(embeddings, args.queries, args.noise, rng)
+
+    exact = ExactSearch(embeddings)
+    start = time.perf_counter()
+    ivf = IVFSearch(embeddings, nlist=args.nlist, seed=args.seed)
+    build_seconds = time.perf_counter() - start
+
+    print(f"corpus={embeddings.shape[0]} nlist={ivf.nlist} build={build_seconds:.2f}s")
+    print(f"exact: {_latency(exact, queries, args.k):.3f} ms/query")
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        recall = recall_at_k(ivf, exact, queries, args.k)
+        print(f"ivf nprobe={nprobe}: recall@{args.k}={recall:.3f} {_latency(ivf, queries, args.k):.3f} ms/query")
+
+
+if __name__ == '__main__':
+    main()
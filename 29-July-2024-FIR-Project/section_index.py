@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+INDEX_PATH = 'section_index.npy'
+META_PATH = 'section_index.json'
+
+
+# Hash of the section texts, so the index is rebuilt when the corpus changes
+def corpus_hash(texts):
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def encode_sections(model, texts, batch_size=64):
+    embeddings = model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+class SectionIndex:
+    def __init__(self, embeddings, model_name, fingerprint):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    # Embeddings are L2-normalised, so one matrix-vector product gives cosine similarity
+    def scores(self, query_embedding):
+        query_embedding = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        return self.embeddings @ query_embedding
+
+    def save(self, index_path=INDEX_PATH, meta_path=META_PATH):
+        # Write to temp files first so a crash never leaves a half-written index behind
+        tmp_index = index_path + '.tmp'
+        with open(tmp_index, 'wb') as file:
+            np.save(file, self.embeddings)
+        tmp_meta = meta_path + '.tmp'
+        with open(tmp_meta, 'w', encoding='utf-8') as file:
+            json.dump({'model_name': self.model_name, 'corpus_hash': self.fingerprint,
+                       'count': len(self), 'dim': int(self.embeddings.shape[1])}, file)
+        os.replace(tmp_index, index_path)
+        os.replace(tmp_meta, meta_path)
+
+
+def load_index(model_name, fingerprint, index_path=INDEX_PATH, meta_path=META_PATH):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        if meta.get('model_name') != model_name or meta.get('corpus_hash') != fingerprint:
+            return None
+        embeddings = np.load(index_path)
+    except (OSError, ValueError):
+        return None
+    if embeddings.dtype != np.float32 or embeddings.shape[0] != meta.get('count'):
+        return None
+    return SectionIndex(embeddings, model_name, fingerprint)
+
+
+# Load the saved index, rebuilding it if the corpus or the model has changed
+def load_or_build_index(model, model_name, texts, index_path=INDEX_PATH, meta_path=META_PATH):
+    fingerprint = corpus_hash(texts)
+    index = load_index(model_name, fingerprint, index_path, meta_path)
+    if index is None:
+        index = SectionIndex(encode_sections(model, texts), model_name, fingerprint)
+        index.save(index_path, meta_path)
+    return index
+
+
+# Pick every section above the similarity floor, lowering the floor in steps
+# until at least min_suggestions sections pass. Instead of rescanning the scores
+# once per step, the min_suggestions-th best score tells us directly which step
+# is the first to let enough sections through.
+def select_relevant(similarities, min_suggestions=5, threshold=0.2, step=0.05):
+    similarities = np.asarray(similarities, dtype=np.float32).reshape(-1)
+    thresholds = []
+    while threshold > 0:
+        thresholds.append(threshold)
+        threshold -= step
+    if not thresholds or min_suggestions <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    floor = thresholds[-1]
+    count = similarities.shape[0]
+    if min_suggestions <= count:
+        kth_best = np.partition(similarities, count - min_suggestions)[count - min_suggestions]
+        for candidate in thresholds:
+            if kth_best > candidate:
+                floor = candidate
+                break
+
+    indices = np.flatnonzero(similarities > floor)
+    indices = indices[np.argsort(-similarities[indices], kind='stable')]
+    return indices, similarities[indices]
@@ -0,0 +1,126 @@
+import argparse
+import json
+import os
+import pickle
+
+import numpy as np
+
+MANIFEST = 'manifest.json'
+
+
+# Column-per-file storage for the preprocessed FIR dataset. Each text column is
+# kept as one UTF-8 byte blob plus an int64 offsets array, both plain .npy files
+# that are memory-mapped on load. Only the retrieval columns are decoded up
+# front; display fields are read from the maps for the rows actually shown.
+def export_store(dataset, directory, source_mtime=None):
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    columns = list(dataset.columns)
+    for column in columns:
+        encoded = [('' if value is None else str(value)).encode('utf-8') for value in dataset[column].tolist()]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.array([len(value) for value in encoded], dtype=np.int64), out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        np.save(os.path.join(directory, f'{column}.offsets.npy'), offsets)
+        np.save(os.path.join(directory, f'{column}.data.npy'), data)
+    # The manifest is written last, so a store without one is incomplete
+    with open(manifest_path, 'w', encoding='utf-8') as file:
+        json.dump({'columns': columns, 'count': len(dataset), 'source_mtime': source_mtime}, file)
+
+
+class SectionStore:
+    def __init__(self, directory, eager_columns=('Combo',)):
+        with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as file:
+            self.manifest = json.load(file)
+        self.directory = directory
+        self.columns = self.manifest['columns']
+        self._maps = {}
+        self._eager = {column: self._decode_all(column) for column in eager_columns}
+
+    def __len__(self):
+        return self.manifest['count']
+
+    def column(self, name):
+        if name in self._eager:
+            return self._eager[name]
+        return self._decode_all(name)
+
+    def value(self, name, row):
+        offsets, data = self._map(name)
+        return bytes(data[offsets[row]:offsets[row + 1]]).decode('utf-8')
+
+    def records(self, rows, columns=None):
+        columns = columns or self.columns
+        return [{column: self._eager[column][row] if column in self._eager else self.value(column, row)
+                 for column in columns} for row in rows]
+
+    def _map(self, name):
+        if name not in self._maps:
+            offsets = np.load(os.path.join(self.directory, f'{name}.offsets.npy'), mmap_mode='r')
+            data = np.load(os.path.join(self.directory, f'{name}.data.npy'), mmap_mode='r')
+            self._maps[name] = (offsets, data)
+        return self._maps[name]
+
+    def _decode_all(self, name):
+        offsets, data = self._map(name)
+        blob = bytes(data)
+        return [blob[offsets[row]:offsets[row + 1]].decode('utf-8') for row in range(len(self))]
+
+
+# Same interface over an in-memory DataFrame, used when no store is available
+class FrameSections:
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.columns = list(dataset.columns)
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def column(self, name):
+        return self.dataset[name].tolist()
+
+    def records(self, rows, columns=None):
+        return self.dataset.iloc[rows][columns or self.columns].to_dict(orient='records')
+
+
+def store_is_current(directory, pickle_path):
+    try:
+        with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return False
+    if not os.path.exists(pickle_path):
+        return True
+    return manifest.get('source_mtime') == os.path.getmtime(pickle_path)
+
+
+# Open the columnar store, (re)exporting it from the pickled DataFrame when it
+# is missing or out of date with the pickle. Falls back to the DataFrame if the store
+# directory cannot be written.
+def load_sections(directory, pickle_path):
+    if not store_is_current(directory, pickle_path):
+        with open(pickle_path, 'rb') as file:
+            dataset = pickle.load(file)
+        try:
+            export_store(dataset, directory, os.path.getmtime(pickle_path))
+        except OSError:
+            return FrameSections(dataset)
+    return SectionStore(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export preprocess_data.pkl to the memory-mappable section store.')
+    parser.add_argument('--pickle', default='preprocess_data.pkl')
+    parser.add_argument('--output', default='section_store')
+    args = parser.parse_args()
+
+    with open(args.pickle, 'rb') as file:
+        dataset = pickle.load(file)
+    export_store(dataset, args.output, os.path.getmtime(args.pickle))
+    print(f"Exported {len(dataset)} sections ({', '.join(dataset.columns)}) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+
+# LRU cache of search results keyed on the preprocessed complaint text.
+# Entries belong to one section index: binding a different fingerprint (new
+# corpus, model or backend) empties the cache, and a saved cache is only
+# reloaded when its fingerprint still matches.
+class SuggestionCache:
+    def __init__(self, maxsize=1024, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.fingerprint = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def bind(self, fingerprint):
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                self._entries.clear()
+                self.fingerprint = fingerprint
+        if self.path:
+            self.load()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries),
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            state = {'fingerprint': self.fingerprint, 'entries': list(self._entries.items())}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(state, file)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as file:
+                state = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return
+        with self._lock:
+            if state.get('fingerprint') != self.fingerprint:
+                return
+            for key, value in state['entries'][-self.maxsize:]:
+                self._entries.setdefault(key, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, '05-August-2024'))
+
+from common.embedding_server import EmbeddingClient, MAX_WAIT, make_server
+from batch_grader import MODEL_NAME, QUESTION_BANK
+from quiz_scoring import EmbeddingModel, read_question_bank
+
+
+# `clients` threads each embed their share of the texts one at a time, as the
+# quiz apps do; returns texts/sec and per-request latencies
+def concurrent_rate(model, texts, clients):
+    latencies = [[] for _ in range(clients)]
+
+    def work(share, times):
+        for text in share:
+            start = time.perf_counter()
+            model.embed(text)
+            times.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=work, args=(texts[number::clients], latencies[number])) for number in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = np.array([value for times in latencies for value in times]) * 1000
+    return {'rate': len(texts) / elapsed, 'p50_ms': float(np.percentile(latencies, 50)),
+            'p95_ms': float(np.percentile(latencies, 95))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Answers/sec under concurrent use: a model loaded in-process vs the shared micro-batching embedding server.')
+    parser.add_argument('--model', default=MODEL_NAME)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16, 32])
+    parser.add_argument('--texts', type=int, default=512)
+    parser.add_argument('--max-wait', type=float, default=MAX_WAIT * 1000, help='server batching deadline in ms')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    answers = [answer for _, _, references in read_question_bank(QUESTION_BANK) for answer in references]
+    texts = [answers[number % len(answers)] for number in range(args.texts)]
+
+    server = make_server(port=args.port, max_wait=args.max_wait / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{args.port}'
+
+    local = EmbeddingModel(args.model, server=None)
+    remote = EmbeddingModel(args.model, server=url)
+    for model in (local, remote):
+        model.load()
+        if model.error is not None:
+            raise SystemExit(f"Could not load {args.model}: {model.error}")
+    difference = float(np.abs(local.embed_batch(texts[:64]) - remote.embed_batch(texts[:64])).max())
+    print(f"largest difference between local and server vectors: {difference:.2e}")
+
+    results = {'model': args.model, 'texts': len(texts), 'max_wait_ms': args.max_wait, 'max_difference': difference, 'runs': []}
+    for clients in args.clients:
+        before = EmbeddingClient(url).stats()[0]
+        in_process = concurrent_rate(local, texts, clients)
+        served = concurrent_rate(remote, texts, clients)
+        after = EmbeddingClient(url).stats()[0]
+        mean_batch = (after['texts'] - before['texts']) / max(after['batches'] - before['batches'], 1)
+        results['runs'].append({'clients': clients, 'in_process': in_process, 'server': served, 'mean_batch': mean_batch})
+        print(f"{clients:3d} clients: in-process {in_process['rate']:7.1f}/s (p95 {in_process['p95_ms']:.1f} ms), "
+              f"server {served['rate']:7.1f}/s (p95 {served['p95_ms']:.1f} ms, mean batch {mean_batch:.1f})")
+
+    server.shutdown()
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, '05-August-2024'))
+
+from batch_grader import BatchGrader, MODEL_NAME, QUESTION_BANK
+from quiz_scoring import read_question_bank
+
+
+# Synthetic roster: each answer is a shuffled, truncated copy of a reference answer
+def synthetic_roster(question_bank, count, seed):
+    rng = random.Random(seed)
+    questions = read_question_bank(question_bank)
+    rows = []
+    for number in range(count):
+        question_id, _, answers = rng.choice(questions)
+        words = rng.choice(answers).split()
+        rng.shuffle(words)
+        rows.append({'student': f'student{number}', 'question_id': question_id,
+                     'answer_text': ' '.join(words[:rng.randint(3, max(3, len(words)))])})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Answers/sec of the batch grader across batch sizes and thread counts.')
+    parser.add_argument('--answers', type=int, default=512)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--model', default=MODEL_NAME)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    import torch
+
+    grader = BatchGrader(model_name=args.model)
+    rows = synthetic_roster(QUESTION_BANK, args.answers, args.seed)
+    grader.grade(rows[:8])  # warm up
+
+    results = []
+    for threads in args.threads:
+        torch.set_num_threads(threads)
+        for batch_size in args.batch_sizes:
+            grader.batch_size = batch_size
+            start = time.perf_counter()
+            grader.grade(rows)
+            rate = len(rows) / (time.perf_counter() - start)
+            results.append({'threads': threads, 'batch_size': batch_size, 'answers_per_sec': rate})
+            print(f"threads={threads} batch_size={batch_size}: {rate:.1f} answers/sec")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'model': args.model, 'answers': len(rows), 'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, '05-August-2024'))
+sys.path.append(os.path.join(ROOT, '29-July-2024-FIR-Project'))
+
+from common.inference_backend import BACKENDS
+from grading import synthetic_roster
+
+QUIZ_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+FIR_MODEL = 'paraphrase-MiniLM-L6-v2'
+
+
+# FIR queries: shuffled, truncated copies of section Combo texts
+def fir_queries(texts, count, seed):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = rng.choice(texts).split()
+        rng.shuffle(words)
+        queries.append(' '.join(words[:rng.randint(3, max(3, len(words)))]))
+    return queries
+
+
+def quiz_worker(backend, model_name, count, seed, batch_size):
+    from batch_grader import QUESTION_BANK
+    from common.text_preprocessing import get_preprocessor
+    from quiz_scoring import EmbeddingModel, read_question_bank
+
+    preprocessor = get_preprocessor('lemma')
+    embedder = EmbeddingModel(model_name, backend=backend)
+    start = time.perf_counter()
+    embedder._ensure_loaded()
+    load_seconds = time.perf_counter() - start
+
+    references = [preprocessor(answer) for _, _, answers in read_question_bank(QUESTION_BANK) for answer in answers]
+    queries = [preprocessor(row['answer_text']) for row in synthetic_roster(QUESTION_BANK, count, seed)]
+    embed = lambda texts, size: embedder.embed_batch(texts, size)
+    return load_seconds, references, queries, embed, batch_size
+
+
+def fir_worker(backend, model_name, count, seed, batch_size):
+    from common.inference_backend import load_sentence_transformer
+    from fir_suggester import DATA_PATH, STORE_DIR
+    from section_store import load_sections
+
+    start = time.perf_counter()
+    model = load_sentence_transformer(model_name, backend)
+    model.encode(['warm up'])
+    load_seconds = time.perf_counter() - start
+
+    references = list(load_sections(STORE_DIR, DATA_PATH).column('Combo'))
+    queries = fir_queries(references, count, seed)
+    embed = lambda texts, size: model.encode(texts, batch_size=size, convert_to_numpy=True, normalize_embeddings=True)
+    return load_seconds, references, queries, embed, batch_size
+
+
+WORKERS = {'quiz': quiz_worker, 'fir': fir_worker}
+
+
+# Runs in its own process so ru_maxrss only covers one backend
+def run_worker(args):
+    load_seconds, references, queries, embed, batch_size = WORKERS[args.worker](
+        args.backend, args.model, args.queries, args.seed, args.batch_size)
+
+    reference_vectors = np.asarray(embed(references, batch_size), dtype=np.float32)
+    # Interactive scoring embeds one answer/complaint at a time
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(np.asarray(embed([query], 1), dtype=np.float32)[0])
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    embed(queries, batch_size)
+    batch_seconds = time.perf_counter() - start
+
+    np.savez(args.output, references=reference_vectors, queries=np.stack(query_vectors))
+    print(json.dumps({
+        'load_seconds': load_seconds,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'batched_per_sec': len(queries) / batch_seconds,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def normalize(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+# Quiz: best-reference score of each synthetic answer against its own question
+def quiz_parity(baseline, candidate, threshold, count, seed):
+    from batch_grader import QUESTION_BANK
+    from quiz_scoring import read_question_bank
+
+    questions = read_question_bank(QUESTION_BANK)
+    offsets = {}
+    position = 0
+    for question_id, _, answers in questions:
+        offsets[question_id] = (position, position + len(answers))
+        position += len(answers)
+    rows = synthetic_roster(QUESTION_BANK, count, seed)
+
+    def scores(vectors):
+        references, queries = normalize(vectors['references']), normalize(vectors['queries'])
+        return np.array([(references[slice(*offsets[row['question_id']])] @ query).max() for row, query in zip(rows, queries)])
+
+    expected, actual = scores(baseline), scores(candidate)
+    return {'max_score_diff': float(np.abs(expected - actual).max()),
+            'decision_agreement': float(((expected > threshold) == (actual > threshold)).mean())}
+
+
+# FIR: overlap of the top-k sections returned for each complaint
+def fir_parity(baseline, candidate, k):
+    def ranking(vectors):
+        scores = normalize(vectors['queries']) @ normalize(vectors['references']).T
+        return np.argsort(-scores, axis=1)[:, :k]
+
+    expected, actual = ranking(baseline), ranking(candidate)
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(expected, actual)]
+    return {f'top{k}_overlap': float(np.mean(overlap)), 'top1_agreement': float((expected[:, 0] == actual[:, 0]).mean())}
+
+
+def compare(baseline, candidate, target, args):
+    cosines = (normalize(baseline['references']) * normalize(candidate['references'])).sum(axis=1)
+    parity = {'mean_cosine': float(cosines.mean()), 'min_cosine': float(cosines.min())}
+    if target == 'quiz':
+        parity.update(quiz_parity(baseline, candidate, args.threshold, args.queries, args.seed))
+    else:
+        parity.update(fir_parity(baseline, candidate, args.k))
+    return parity
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Accuracy parity and latency/memory of the fp32, int8 and onnx inference backends.')
+    parser.add_argument('--targets', nargs='+', choices=list(WORKERS), default=list(WORKERS))
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--quiz-model', default=QUIZ_MODEL)
+    parser.add_argument('--fir-model', default=FIR_MODEL)
+    parser.add_argument('--queries', type=int, default=200, help='synthetic answers/complaints scored per backend')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--threshold', type=float, default=0.5, help='quiz pass mark used for decision agreement')
+    parser.add_argument('--k', type=int, default=5, help='FIR suggestions compared per complaint')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--worker', choices=list(WORKERS), help=argparse.SUPPRESS)
+    parser.add_argument('--backend', help=argparse.SUPPRESS)
+    parser.add_argument('--model', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    backends = ['fp32'] + [backend for backend in args.backends if backend != 'fp32']
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for target in args.targets:
+            model = args.quiz_model if target == 'quiz' else args.fir_model
+            results[target] = {'model': model}
+            vectors = {}
+            for backend in backends:
+                output = os.path.join(workdir, f'{target}-{backend}.npz')
+                command = [sys.executable, os.path.abspath(__file__), '--worker', target, '--backend', backend,
+                           '--model', model, '--output', output, '--queries', str(args.queries),
+                           '--batch-size', str(args.batch_size), '--seed', str(args.seed)]
+                result = subprocess.run(command, capture_output=True, text=True)
+                if result.returncode != 0:
+                    print(f"{target}/{backend}: failed\n{result.stderr[-2000:]}", file=sys.stderr)
+                    continue
+                stats = json.loads(result.stdout.strip().splitlines()[-1])
+                vectors[backend] = dict(np.load(output))
+                if backend != 'fp32' and 'fp32' in vectors:
+                    stats.update(compare(vectors['fp32'], vectors[backend], target, args))
+                    stats['speedup_p50'] = results[target]['fp32']['p50_ms'] / stats['p50_ms']
+                results[target][backend] = stats
+                print(f"{target}/{backend}: " + ', '.join(f'{key}={value:.3f}' for key, value in stats.items()))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
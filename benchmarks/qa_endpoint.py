@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, '02-August-2024'))
+
+import requests
+
+from qa_client import QAClient
+
+
+# Local stand-in for the Hugging Face question answering endpoint. Answers
+# with the first sentence of the context after `latency` seconds, and replies
+# 503 "model is loading" to the first `loading` requests, like a cold model.
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+    latency = 0.0
+    loading = 0
+    requests_seen = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with StandInHandler.lock:
+            StandInHandler.requests_seen += 1
+            cold = StandInHandler.requests_seen <= self.loading
+        if cold:
+            self._reply(503, {'error': 'Model is currently loading', 'estimated_time': 0.05})
+            return
+        time.sleep(self.latency)
+        context = payload.get('inputs', {}).get('context', '')
+        answer = context.split('.')[0]
+        self._reply(200, {'score': 0.9, 'start': 0, 'end': len(answer), 'answer': answer})
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port, latency, loading):
+    StandInHandler.latency = latency
+    StandInHandler.loading = loading
+    StandInHandler.requests_seen = 0
+    server = ThreadingHTTPServer(('127.0.0.1', port), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+PAYLOAD = {"inputs": {"question": "What is my name?", "context": "My name is Clara and I live in Berkeley."}}
+
+
+def unpooled_query(url, payload):
+    return requests.post(url, json=payload).json()
+
+
+def run(query, count, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: query(PAYLOAD), range(count)))
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in QA endpoint, and a pooled vs unpooled client comparison against it.')
+    parser.add_argument('mode', choices=['serve', 'bench'])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.01, help='seconds the stand-in takes per answer')
+    parser.add_argument('--loading', type=int, default=0, help='503 replies before the stand-in "model" is ready')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.latency, args.loading)
+    url = f'http://127.0.0.1:{args.port}/'
+    if args.mode == 'serve':
+        print(f"Serving on {url} (set QA_API_URL to use it)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            return
+
+    results = []
+    for concurrency in args.concurrency:
+        client = QAClient(url, max_concurrency=concurrency, backoff=0.05)
+        pooled = run(client.query, args.requests, concurrency)
+        unpooled = run(lambda payload: unpooled_query(url, payload), args.requests, concurrency)
+        client.close()
+        results.append({'concurrency': concurrency, 'pooled_per_sec': pooled, 'unpooled_per_sec': unpooled})
+        print(f"concurrency={concurrency}: pooled {pooled:.1f} req/s, one connection per request {unpooled:.1f} req/s")
+    server.shutdown()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'latency': args.latency, 'requests': args.requests, 'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, '23-July-2024'))
+
+from score_reviews import score_stream
+from sentiment_model import BUCKETS, DATA_PATH, MAXLEN, MODEL_PATH, TOKENIZER_PATH, SentimentModel
+
+
+def flipkart_reviews():
+    import pandas as pd
+    return pd.read_csv(DATA_PATH)['Review'].fillna('').astype(str).tolist()
+
+
+# Synthetic feed: each review is a shuffled copy of a real one, generated lazily
+def synthetic_reviews(reviews, count, seed):
+    rng = random.Random(seed)
+    for number in range(count):
+        words = rng.choice(reviews).split()
+        rng.shuffle(words)
+        yield number, ' '.join(words)
+
+
+# The notebook's predict_user_input: one pad_sequences + model.predict per review
+def per_review_rate(model, saved, reviews):
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
+    start = time.perf_counter()
+    for review in reviews:
+        saved.predict(pad_sequences(model.sequences([review]), maxlen=MAXLEN), verbose=0)
+    return len(reviews) / (time.perf_counter() - start)
+
+
+def fixed_length_rate(model, saved, reviews, batch_size):
+    from tensorflow.keras.preprocessing.sequence import pad_sequences
+    start = time.perf_counter()
+    probabilities = saved.predict(pad_sequences(model.sequences(reviews), maxlen=MAXLEN), batch_size=batch_size, verbose=0)
+    return len(reviews) / (time.perf_counter() - start), probabilities
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reviews/sec of the sentiment LSTM: per-review predict vs batched vs length-bucketed.')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--tokenizer', default=TOKENIZER_PATH)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--per-review', type=int, default=200, help='reviews scored one predict() call at a time')
+    parser.add_argument('--synthetic-rows', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=8192)
+    parser.add_argument('--short-buckets', action='store_true', help='pad an unmasked model to BUCKETS as well (approximate)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    from tensorflow.keras.models import load_model
+
+    reviews = flipkart_reviews()
+    model = SentimentModel(args.model, args.tokenizer, buckets=BUCKETS if args.short_buckets else None, batch_size=args.batch_size)
+    saved = load_model(args.model)
+    model.predict_proba(reviews[:64])  # trace the forward pass
+
+    results = {'reviews': len(reviews)}
+    results['per_review_predict'] = per_review_rate(model, saved, reviews[:args.per_review])
+    results['fixed_length_batched'], expected = fixed_length_rate(model, saved, reviews, args.batch_size)
+    start = time.perf_counter()
+    actual = model.predict_proba(reviews)
+    results['bucketed'] = len(reviews) / (time.perf_counter() - start)
+    results['label_agreement'] = float((actual.argmax(axis=1) == expected.argmax(axis=1)).mean())
+    results['max_probability_diff'] = float(np.abs(actual - expected).max())
+    print(f"flipkart.csv ({len(reviews)} reviews): per-review predict {results['per_review_predict']:.1f}/s, "
+          f"fixed 200 batched {results['fixed_length_batched']:.1f}/s, bucketed {results['bucketed']:.1f}/s, "
+          f"label agreement {results['label_agreement']:.4f}, largest probability difference {results['max_probability_diff']:.4f}")
+    # By default an unmasked model sees the same 200-token input as the notebook
+    if not model.masked and not args.short_buckets and results['label_agreement'] < 1.0:
+        raise SystemExit('Parity check failed: the default scoring path changed labels of the unmasked model')
+
+    if args.synthetic_rows:
+        start = time.perf_counter()
+        scored = sum(1 for _ in score_stream(model, synthetic_reviews(reviews, args.synthetic_rows, args.seed), args.chunk_size))
+        results['synthetic_rows'] = scored
+        results['synthetic_streaming'] = scored / (time.perf_counter() - start)
+        print(f"synthetic ({scored} reviews, streamed): {results['synthetic_streaming']:.1f}/s")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
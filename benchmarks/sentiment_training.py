@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, '23-July-2024'))
+
+from sentiment_model import DATA_PATH, train
+
+
+# Keras callback that records the wall time of every epoch
+def epoch_timer():
+    from tensorflow.keras.callbacks import Callback
+
+    class EpochTimer(Callback):
+        def __init__(self):
+            super().__init__()
+            self.seconds = []
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self.start = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            self.seconds.append(time.perf_counter() - self.start)
+
+    return EpochTimer()
+
+
+def run(data, epochs, batch_size, bucketed):
+    timer = epoch_timer()
+    _, _, accuracy = train(data, epochs, batch_size, bucketed=bucketed, callbacks=[timer])
+    # The first epoch also pays for tracing, so it is reported separately
+    steady = timer.seconds[1:] or timer.seconds
+    return {'epoch_seconds': timer.seconds, 'first_epoch': timer.seconds[0],
+            'mean_epoch': sum(steady) / len(steady), 'test_accuracy': float(accuracy)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Epoch time and test accuracy of the sentiment LSTM: fixed 200-token padding vs the bucketed tf.data pipeline.')
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    for name, bucketed in (('fixed_length', False), ('bucketed', True)):
+        results[name] = run(args.data, args.epochs, args.batch_size, bucketed)
+    for name, result in results.items():
+        print(f"{name}: first epoch {result['first_epoch']:.1f}s, later epochs {result['mean_epoch']:.1f}s, "
+              f"test accuracy {result['test_accuracy']:.4f}")
+    print(f"epoch speedup {results['fixed_length']['mean_epoch'] / results['bucketed']['mean_epoch']:.1f}x")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
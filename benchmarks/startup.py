@@ -0,0 +1,58 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, working directory, script)
+APPS = [
+    ('fir', '29-July-2024-FIR-Project', 'fir-project-gui.py'),
+    ('quiz-speech', '05-August-2024', 'self.py'),
+    ('quiz-text', '05-August-2024', 'Student-Evaluation-Speech-to-Text-Project.py'),
+]
+
+
+# Launch the app once with STARTUP_BENCHMARK set and read back the timestamps
+# it prints (see common/startup_probe.py). Needs a display.
+def measure(workdir, script, timeout):
+    env = dict(os.environ, STARTUP_BENCHMARK='1')
+    start = time.time()
+    result = subprocess.run([sys.executable, script], cwd=os.path.join(ROOT, workdir), env=env,
+                            capture_output=True, text=True, timeout=timeout)
+    marks = {}
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[0] == 'STARTUP':
+            marks[parts[1]] = float(parts[2]) - start
+    if 'first_result' not in marks:
+        raise RuntimeError(f"{script} exited without a result:\n{result.stderr[-2000:]}")
+    return marks
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time-to-first-window and time-to-first-result of the Tk apps.')
+    parser.add_argument('--apps', nargs='+', default=[name for name, _, _ in APPS])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    for name, workdir, script in APPS:
+        if name not in args.apps:
+            continue
+        runs = [measure(workdir, script, args.timeout) for _ in range(args.runs)]
+        results[name] = {event: statistics.median(run[event] for run in runs) for event in ('first_window', 'first_result')}
+        print(f"{name}: first window {results[name]['first_window']:.2f}s, first result {results[name]['first_result']:.2f}s")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIR_DIR = os.path.join(ROOT, '29-July-2024-FIR-Project')
+QUIZ_DIR = os.path.join(ROOT, '05-August-2024')
+sys.path.append(ROOT)
+sys.path.append(FIR_DIR)
+sys.path.append(QUIZ_DIR)
+
+# The suite never downloads anything: models must already be in the Hugging
+# Face cache, or be given as local directories
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+# Every model is loaded in-process, never from a shared embedding server
+os.environ.pop('EMBEDDING_SERVER', None)
+
+FIR_CSV = os.path.join(FIR_DIR, 'FIR-DATA.csv')
+FIR_PICKLE = os.path.join(FIR_DIR, 'preprocess_data.pkl')
+QUESTION_BANK = os.path.join(QUIZ_DIR, 'questions_answers.csv')
+FIR_MODEL = 'paraphrase-MiniLM-L6-v2'
+QUIZ_MODEL = 'bert-base-uncased'
+BENCHMARKS = ('preprocess', 'suggest', 'quiz', 'pickle', 'cold_start')
+
+
+def percentiles(seconds):
+    milliseconds = np.array(seconds) * 1000
+    return {'p50_ms': float(np.percentile(milliseconds, 50)), 'p95_ms': float(np.percentile(milliseconds, 95))}
+
+
+def median_time(func, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+# Shuffled, truncated copies of real texts, so queries look like the corpus
+# without repeating it word for word
+def synthetic_texts(texts, count, seed, min_words=5, max_words=30):
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(count):
+        words = rng.choice(texts).split()
+        rng.shuffle(words)
+        samples.append(' '.join(words[:rng.randint(min_words, max(min_words, min(max_words, len(words))))]))
+    return samples
+
+
+def fir_complaints(count, seed):
+    import pandas as pd
+    return synthetic_texts(pd.read_csv(FIR_CSV)['Description'].fillna('').tolist(), count, seed)
+
+
+# preprocess_text over FIR-DATA.csv (Description + Offense, as build_dataset
+# does). The first pass starts with an empty stem cache, later passes hit it.
+def bench_preprocess(args):
+    import pandas as pd
+    from common.text_preprocessing import TextPreprocessor
+    dataset = pd.read_csv(FIR_CSV).fillna('Not Mentioned')
+    texts = (dataset['Description'] + dataset['Offense']).tolist()
+    preprocessor = TextPreprocessor('stem')
+    cold = median_time(lambda: [preprocessor(text) for text in texts], 1)
+    warm = median_time(lambda: [preprocessor(text) for text in texts], args.repeats)
+    return {'texts': len(texts), 'cold_texts_per_sec': len(texts) / cold, 'warm_texts_per_sec': len(texts) / warm}
+
+
+# preprocess_data.pkl repeated `scale` times; every copy after the first has
+# the words of each Combo shuffled so the sections do not embed identically
+def upscale_sections(dataset, scale, seed):
+    import pandas as pd
+    rng = random.Random(seed)
+    copies = [dataset]
+    for _ in range(scale - 1):
+        copy = dataset.copy()
+        copy['Combo'] = [' '.join(rng.sample(words, len(words))) for words in (text.split() for text in dataset['Combo'])]
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+# suggest_sections latency, uncached, on a corpus `scale` times FIR-DATA.
+# setup_s covers loading the model and embedding every section. With no
+# --candidates every section is scored exactly, whatever --retrieval says.
+def bench_suggest(args, scale, workdir):
+    from fir_suggester import SectionSuggester
+    with open(FIR_PICKLE, 'rb') as file:
+        sections = upscale_sections(pickle.load(file), scale, args.seed)
+    directory = os.path.join(workdir, f'fir-x{scale}')
+    os.makedirs(directory, exist_ok=True)
+    data_path = os.path.join(directory, 'preprocess_data.pkl')
+    with open(data_path, 'wb') as file:
+        pickle.dump(sections, file)
+
+    start = time.perf_counter()
+    suggester = SectionSuggester(data_path, args.fir_model, backend=args.retrieval, cache_size=0,
+                                 store_dir=os.path.join(directory, 'section_store'),
+                                 index_path=os.path.join(directory, 'section_index.npy'),
+                                 meta_path=os.path.join(directory, 'section_index.json'),
+                                 ivf_path=os.path.join(directory, 'section_index.ivf.npz'))
+    setup = time.perf_counter() - start
+
+    complaints = fir_complaints(args.queries, args.seed)
+    for complaint in complaints[:5]:
+        suggester.suggest_sections(complaint, candidates=args.candidates)
+    latencies = []
+    for complaint in complaints:
+        start = time.perf_counter()
+        suggester.suggest_sections(complaint, candidates=args.candidates)
+        latencies.append(time.perf_counter() - start)
+    return dict(sections=len(sections), setup_s=setup, queries_per_sec=len(latencies) / sum(latencies), **percentiles(latencies))
+
+
+# What NLPQuizApp does per answer: get_embedding alone, and compare_answer's
+# preprocess + embed + score against the question's reference answers.
+# references_s embeds the whole question bank with no cache file.
+def bench_quiz(args, workdir):
+    from common.text_preprocessing import get_preprocessor
+    from quiz_scoring import EmbeddingModel, ReferenceEmbeddings, load_question_bank, score_answer
+    preprocessor = get_preprocessor('lemma')
+    questions = load_question_bank(QUESTION_BANK)
+    embedder = EmbeddingModel(args.quiz_model, server=None)
+    embedder.load()
+    if embedder.error is not None:
+        raise RuntimeError(f"Could not load {args.quiz_model}: {embedder.error}")
+
+    cache = ReferenceEmbeddings(os.path.join(workdir, 'reference_embeddings.npz'), embedder.cache_id)
+    start = time.perf_counter()
+    references = cache.build(questions, embedder.embed_batch, preprocessor)
+    references_time = time.perf_counter() - start
+
+    rng = random.Random(args.seed)
+    numbers = [rng.randrange(len(questions)) for _ in range(args.answers)]
+    answers = [synthetic_texts(questions[number][1], 1, args.seed + position)[0] for position, number in enumerate(numbers)]
+    embed_time = median_time(lambda: [embedder.embed(answer) for answer in answers], 1)
+    latencies = []
+    for number, answer in zip(numbers, answers):
+        start = time.perf_counter()
+        score_answer(embedder.embed(preprocessor(answer)), references[number], 'max')
+        latencies.append(time.perf_counter() - start)
+    return dict(questions=len(questions), references_s=references_time, get_embedding_per_sec=len(answers) / embed_time,
+                compare_answer_per_sec=len(latencies) / sum(latencies),
+                **{f'compare_answer_{name}': value for name, value in percentiles(latencies).items()})
+
+
+# Reading preprocess_data.pkl, against opening the memory-mapped section store
+def bench_pickle(args, workdir):
+    from section_store import load_sections
+
+    def load_pickle():
+        with open(FIR_PICKLE, 'rb') as file:
+            return pickle.load(file)
+
+    rows = len(load_pickle())
+    store_dir = os.path.join(workdir, 'section_store')
+    load_sections(store_dir, FIR_PICKLE)  # export once
+    return {'rows': rows, 'pickle_load_ms': median_time(load_pickle, args.repeats) * 1000,
+            'section_store_open_ms': median_time(lambda: load_sections(store_dir, FIR_PICKLE), args.repeats) * 1000}
+
+
+COLD_FIR = '''
+import json, sys, time
+start = time.perf_counter()
+from fir_suggester import SectionSuggester
+imported = time.perf_counter()
+suggester = SectionSuggester(model_name=sys.argv[1], cache_size=0)
+loaded = time.perf_counter()
+suggester.suggest_sections('Someone broke into my house at night and stole my jewellery')
+print(json.dumps([imported - start, loaded - start, time.perf_counter() - start]))
+'''
+
+COLD_QUIZ = '''
+import json, sys, time
+start = time.perf_counter()
+from quiz_scoring import EmbeddingModel
+imported = time.perf_counter()
+embedder = EmbeddingModel(sys.argv[1], server=None)
+embedder.load()
+if embedder.error is not None:
+    raise SystemExit(str(embedder.error))
+loaded = time.perf_counter()
+embedder.embed('Python is a high-level programming language.')
+print(json.dumps([imported - start, loaded - start, time.perf_counter() - start]))
+'''
+
+
+# Fresh interpreters: time to import, to have the model ready and to return
+# the first result, plus the whole process including interpreter start-up.
+# The first run of each is not counted, so the section index already exists.
+def bench_cold_start(args):
+    results = {}
+    for name, workdir, script, model in (('fir', FIR_DIR, COLD_FIR, args.fir_model), ('quiz', QUIZ_DIR, COLD_QUIZ, args.quiz_model)):
+        runs = []
+        for run in range(args.cold_runs + 1):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, '-c', script, model], cwd=workdir, capture_output=True, text=True)
+            elapsed = time.perf_counter() - start
+            if result.returncode != 0:
+                raise RuntimeError(f"{name} cold start failed:\n{result.stderr[-2000:]}")
+            if run:
+                runs.append(json.loads(result.stdout.strip().splitlines()[-1]) + [elapsed])
+        for position, metric in enumerate(('import_s', 'ready_s', 'first_result_s', 'process_s')):
+            results[f'{name}_{metric}'] = statistics.median(run[position] for run in runs)
+    return results
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit or None, 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpus': os.cpu_count(), 'fir_model': args.fir_model,
+            'quiz_model': args.quiz_model, 'retrieval': args.retrieval, 'candidates': args.candidates, 'scales': args.scales, 'seed': args.seed}
+
+
+def run(args):
+    if args.threads:
+        import torch
+        torch.set_num_threads(args.threads)
+    selected = args.only or BENCHMARKS
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        jobs = []
+        if 'preprocess' in selected:
+            jobs.append(('preprocess_text', lambda: bench_preprocess(args)))
+        if 'suggest' in selected:
+            jobs += [(f'suggest_sections_x{scale}', lambda scale=scale: bench_suggest(args, scale, workdir)) for scale in args.scales]
+        if 'quiz' in selected:
+            jobs.append(('quiz_scoring', lambda: bench_quiz(args, workdir)))
+        if 'pickle' in selected:
+            jobs.append(('pickle_load', lambda: bench_pickle(args, workdir)))
+        if 'cold_start' in selected:
+            jobs.append(('cold_start', lambda: bench_cold_start(args)))
+        for name, job in jobs:
+            try:
+                results[name] = job()
+            except Exception as e:
+                # A benchmark that cannot run here (missing model or data) is recorded, not fatal
+                results[name] = {'error': f'{type(e).__name__}: {e}'}
+            print(f"{name}: " + ', '.join(f'{key} {value:.4g}' if isinstance(value, float) else f'{key} {value}'
+                                          for key, value in results[name].items()))
+
+    report = {'meta': metadata(args), 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f"Wrote {args.output}")
+
+
+# Throughputs (*_per_sec) should not fall and times (*_ms, *_s) should not
+# rise; anything else is a count and is not compared
+def direction(metric):
+    if metric.endswith('_per_sec'):
+        return 1
+    if metric.endswith('_ms') or metric.endswith('_s'):
+        return -1
+    return 0
+
+
+# Metrics that got worse by more than `threshold` (a fraction) from baseline
+# to current, as (benchmark, metric, baseline value, current value, change)
+def regressions(baseline, current, threshold):
+    found = []
+    for name, metrics in current['results'].items():
+        before = baseline['results'].get(name, {})
+        for metric, value in metrics.items():
+            sign = direction(metric)
+            old = before.get(metric)
+            if not sign or not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or old <= 0:
+                continue
+            change = value / old - 1
+            if change * sign < -threshold:
+                found.append((name, metric, old, value, change))
+    return found
+
+
+def compare(args):
+    with open(args.baseline, 'r', encoding='utf-8') as file:
+        baseline = json.load(file)
+    with open(args.current, 'r', encoding='utf-8') as file:
+        current = json.load(file)
+    for key in ('cpus', 'fir_model', 'quiz_model', 'retrieval', 'candidates', 'scales'):
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print(f"warning: {key} differs ({baseline['meta'].get(key)} vs {current['meta'].get(key)}), results may not be comparable")
+
+    flagged = {(name, metric) for name, metric, *_ in regressions(baseline, current, args.threshold)}
+    for name, metrics in current['results'].items():
+        before = baseline['results'].get(name, {})
+        if 'error' in metrics or 'error' in before:
+            print(f"{name}: not compared ({metrics.get('error') or before.get('error')})")
+            continue
+        for metric, value in metrics.items():
+            old = before.get(metric)
+            if not direction(metric) or not isinstance(old, (int, float)) or not old:
+                continue
+            flag = '  REGRESSION' if (name, metric) in flagged else ''
+            print(f"{name}.{metric}: {old:.4g} -> {value:.4g} ({value / old - 1:+.1%}){flag}")
+    print(f"{len(flagged)} regression(s) beyond {args.threshold:.0%}")
+    return 1 if flagged else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks of the FIR retrieval and quiz grading hot paths.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks and write the results as JSON')
+    run_parser.add_argument('--output', help='JSON file to write')
+    run_parser.add_argument('--only', nargs='+', choices=BENCHMARKS, help='run just these benchmarks')
+    run_parser.add_argument('--fir-model', default=FIR_MODEL, help='cached model name or local directory')
+    run_parser.add_argument('--quiz-model', default=QUIZ_MODEL, help='cached model name or local directory')
+    run_parser.add_argument('--retrieval', default='exact', help='FIR retrieval backend (exact or ivf)')
+    run_parser.add_argument('--candidates', type=int, default=None, help='sections the backend returns per complaint (default: all, by exact search)')
+    run_parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 50], help='FIR corpus sizes, as multiples of FIR-DATA')
+    run_parser.add_argument('--queries', type=int, default=200, help='complaints timed per corpus size')
+    run_parser.add_argument('--answers', type=int, default=200, help='quiz answers timed')
+    run_parser.add_argument('--repeats', type=int, default=5)
+    run_parser.add_argument('--cold-runs', type=int, default=3)
+    run_parser.add_argument('--threads', type=int, default=None, help='torch intra-op threads')
+    run_parser.add_argument('--seed', type=int, default=0)
+
+    compare_parser = commands.add_parser('compare', help='flag regressions between two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.10, help='relative change that counts as a regression')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, '05-August-2024'))
+
+import speech_recognition as sr
+
+from audio_capture import BLOCK_SIZE, SAMPLE_RATE, SAMPLE_WIDTH
+from speech_backends import SEGMENT_WORKERS, SegmentedTranscription, make_asr_backend, transcribe_recording
+from vad import SpeechSegmenter
+
+
+# Stand-in recognizer whose cost grows with the audio length like a real one:
+# a fixed round-trip plus rtf seconds per second of audio. Time is divided by
+# speedup so long answers can be benchmarked quickly.
+class SimulatedBackend:
+    name = 'simulated'
+    streaming = False
+
+    def __init__(self, overhead, rtf, speedup):
+        self.overhead = overhead
+        self.rtf = rtf
+        self.speedup = speedup
+
+    def transcribe(self, audio_data):
+        seconds = len(audio_data.frame_data) / (audio_data.sample_rate * audio_data.sample_width)
+        time.sleep((self.overhead + self.rtf * seconds) / self.speedup)
+        return f'<{seconds:.1f}s>'
+
+
+# Speech-like test signal: bursts of noise (phrases) separated by quiet pauses
+def synthetic_answer(seconds, seed):
+    rng = np.random.default_rng(seed)
+    parts = []
+    total = 0
+    while total < seconds * SAMPLE_RATE:
+        phrase = int(rng.uniform(0.8, 3.0) * SAMPLE_RATE)
+        pause = int(rng.uniform(0.6, 1.0) * SAMPLE_RATE)
+        parts.append(rng.normal(0, 3000, phrase))
+        parts.append(rng.normal(0, 50, pause))
+        total += phrase + pause
+    return np.clip(np.concatenate(parts)[:seconds * SAMPLE_RATE], -32768, 32767).astype(np.int16)
+
+
+# The segmenter must find every phrase whether the answer opens with speech,
+# a short silence or two seconds of room noise, in a quiet room and with
+# steady noise above its min_energy: three 2 s bursts, 0.7 s apart, fed in
+# recording-sized blocks. Each segment must hold a whole burst.
+def check_segmentation(seed):
+    rng = np.random.default_rng(seed)
+    failures = []
+    for noise in (50, 400, 1000):
+        for lead in (0.0, 0.3, 2.0):
+            parts = [rng.normal(0, noise, int(lead * SAMPLE_RATE))]
+            for _ in range(3):
+                parts.append(rng.normal(0, 3000, 2 * SAMPLE_RATE))
+                parts.append(rng.normal(0, noise, int(0.7 * SAMPLE_RATE)))
+            samples = np.clip(np.concatenate(parts), -32768, 32767).astype(np.int16)
+            segmenter = SpeechSegmenter()
+            segments = []
+            for start in range(0, len(samples), BLOCK_SIZE):
+                segments += segmenter.feed(samples[start:start + BLOCK_SIZE])
+            segments += segmenter.flush()
+            lengths = [round(len(segment) / SAMPLE_RATE, 1) for segment in segments]
+            if len(segments) != 3 or min(lengths) < 2.0:
+                failures.append(f"noise {noise}, {lead:.1f}s lead-in: segments of {lengths}s, expected three of 2s or more")
+    if failures:
+        raise SystemExit('Segmentation check failed: ' + '; '.join(failures))
+
+
+def answer_from_wav(path, seconds):
+    with sr.AudioFile(path) as source:
+        audio_data = sr.Recognizer().record(source)
+    samples = np.frombuffer(audio_data.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=SAMPLE_WIDTH), dtype=np.int16)
+    return np.resize(samples, seconds * SAMPLE_RATE)
+
+
+def wait(transcription):
+    transcription.finished.wait()
+    if transcription.error is not None and not isinstance(transcription.error, sr.UnknownValueError):
+        raise transcription.error
+
+
+# Seconds from the end of the recording until the transcript is ready
+def whole_latency(backend, samples):
+    start = time.perf_counter()
+    try:
+        backend.transcribe(sr.AudioData(samples.tobytes(), SAMPLE_RATE, SAMPLE_WIDTH))
+    except sr.UnknownValueError:
+        pass
+    return time.perf_counter() - start
+
+
+def segmented_latency(backend, samples, workers):
+    start = time.perf_counter()
+    wait(transcribe_recording(backend, sr.AudioData(samples.tobytes(), SAMPLE_RATE, SAMPLE_WIDTH), workers))
+    return time.perf_counter() - start
+
+
+# Blocks are fed at the recording rate (times speedup), as the recorder would
+def streaming_latency(backend, samples, workers, speedup):
+    transcription = SegmentedTranscription(backend, workers)
+    for start in range(0, len(samples), BLOCK_SIZE):
+        transcription.feed(samples[start:start + BLOCK_SIZE])
+        time.sleep(BLOCK_SIZE / SAMPLE_RATE / speedup)
+    start = time.perf_counter()
+    transcription.close()
+    wait(transcription)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time from the end of an answer to its transcript, by answer length.')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[10, 30, 60, 120], help='answer lengths in seconds')
+    parser.add_argument('--backend', default='simulated', help='simulated, google or vosk')
+    parser.add_argument('--wav', help='speech recording to loop for the real backends (default: synthetic bursts)')
+    parser.add_argument('--workers', type=int, default=SEGMENT_WORKERS)
+    parser.add_argument('--overhead', type=float, default=0.5, help='simulated round-trip seconds per request')
+    parser.add_argument('--rtf', type=float, default=0.3, help='simulated seconds of work per second of audio')
+    parser.add_argument('--speedup', type=float, default=20.0, help='simulated runs only: play time this much faster')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    check_segmentation(args.seed)
+    if args.backend == 'simulated':
+        backend = SimulatedBackend(args.overhead, args.rtf, args.speedup)
+        scale = args.speedup
+    else:
+        backend = make_asr_backend(args.backend)
+        scale = 1.0
+        args.speedup = 1.0
+
+    results = []
+    for seconds in args.lengths:
+        samples = answer_from_wav(args.wav, seconds) if args.wav else synthetic_answer(seconds, args.seed)
+        result = {
+            'seconds': seconds,
+            'whole': whole_latency(backend, samples) * scale,
+            'segmented': segmented_latency(backend, samples, args.workers) * scale,
+            'while_recording': streaming_latency(backend, samples, args.workers, args.speedup) * scale,
+        }
+        results.append(result)
+        print(f"{seconds:4d}s answer: whole {result['whole']:.2f}s, segmented {result['segmented']:.2f}s, "
+              f"segmented while recording {result['while_recording']:.2f}s")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'backend': args.backend, 'workers': args.workers, 'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
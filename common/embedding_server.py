@@ -0,0 +1,343 @@
+import argparse
+import base64
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Empty, Queue
+from urllib.parse import urlsplit
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from common.inference_backend import DEFAULT_BACKEND, check_backend
+
+# Shared embedding service for the FIR and quiz apps. Run it once per machine:
+#
+#     python common/embedding_server.py --preload paraphrase-MiniLM-L6-v2:sentence
+#
+# and point the apps at it with EMBEDDING_SERVER=http://127.0.0.1:8765. Each
+# model is loaded once, however many apps use it, and requests that arrive
+# together are run as one batch.
+HOST = '127.0.0.1'
+PORT = 8765
+DEFAULT_SERVER = os.environ.get('EMBEDDING_SERVER') or None
+
+# Requests are coalesced until a batch holds MAX_BATCH texts or the first one
+# has waited MAX_WAIT seconds
+MAX_BATCH = 64
+MAX_WAIT = 0.005
+
+# transformer - mean-pooled last_hidden_state, as EmbeddingModel (quiz apps)
+# sentence    - SentenceTransformer.encode, as SectionSuggester (FIR app)
+KINDS = ('transformer', 'sentence')
+
+
+class EmbeddingServiceError(RuntimeError):
+    pass
+
+
+# Runs embed(texts) on one worker thread. Requests queued while the worker is
+# busy, or that arrive within max_wait of the first one, are joined into a
+# single call of up to max_batch texts (a larger request is never split), and
+# each caller's Future gets its own rows back. The worker only waits out the
+# deadline while requests are overlapping (the last batch held more than
+# one), so a lone client is not slowed down by it.
+class MicroBatcher:
+    def __init__(self, embed, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.embed = embed
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self._concurrent = False
+        self._queue = Queue()
+        self._thread = threading.Thread(target=self._run, name='embed-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, texts):
+        future = Future()
+        self._queue.put((list(texts), future))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            pending = [item]
+            count = len(item[0])
+            deadline = time.monotonic() + (self.max_wait if self._concurrent else 0)
+            while count < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # finish this batch, then stop
+                    break
+                pending.append(item)
+                count += len(item[0])
+            self._concurrent = len(pending) > 1
+            self._embed(pending)
+
+    def _embed(self, pending):
+        texts = [text for batch, _ in pending for text in batch]
+        try:
+            embeddings = self.embed(texts)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        self.requests += len(pending)
+        self.batches += 1
+        self.texts += len(texts)
+        start = 0
+        for batch, future in pending:
+            future.set_result(embeddings[start:start + len(batch)])
+            start += len(batch)
+
+    def stats(self):
+        return {'requests': self.requests, 'batches': self.batches, 'texts': self.texts,
+                'mean_batch': self.texts / self.batches if self.batches else 0.0}
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+# One model as the server runs it. Loading happens on the batcher's thread
+# the first time the model is asked for, so a slow load only holds up the
+# requests for that model. A coalesced batch of up to max_batch texts goes
+# through as one forward pass.
+class ServedModel:
+    def __init__(self, kind, model_name, backend, max_length, max_batch=MAX_BATCH):
+        self.kind = kind
+        self.max_batch = max_batch
+        self.model_name = model_name
+        self.backend = backend
+        self.max_length = max_length
+        self.model = None
+        self.tokenizer = None
+
+    def load(self):
+        from common.inference_backend import load_sentence_transformer, load_transformer
+        if self.kind == 'sentence':
+            self.model = load_sentence_transformer(self.model_name, self.backend)
+        else:
+            self.tokenizer, self.model = load_transformer(self.model_name, self.backend)
+
+    def __call__(self, texts):
+        from common.inference_backend import mean_pooled_embeddings
+        if self.model is None:
+            self.load()
+        if self.kind == 'sentence':
+            embeddings = self.model.encode(texts, batch_size=self.max_batch, convert_to_numpy=True)
+            return np.asarray(embeddings, dtype=np.float32)
+        return mean_pooled_embeddings(self.tokenizer, self.model, texts, self.max_length, self.max_batch)
+
+
+# A MicroBatcher per (kind, model, backend, max_length), created on first use
+class ModelPool:
+    def __init__(self, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._batchers = {}
+        self._lock = threading.Lock()
+
+    def batcher(self, kind, model_name, backend=DEFAULT_BACKEND, max_length=None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown model kind '{kind}', expected one of {', '.join(KINDS)}")
+        check_backend(backend)
+        key = (kind, model_name, backend, max_length)
+        with self._lock:
+            if key not in self._batchers:
+                self._batchers[key] = MicroBatcher(ServedModel(*key, self.max_batch), self.max_batch, self.max_wait)
+            return self._batchers[key]
+
+    def embed(self, texts, kind, model_name, backend=DEFAULT_BACKEND, max_length=None):
+        return self.batcher(kind, model_name, backend, max_length).submit(texts).result()
+
+    def stats(self):
+        with self._lock:
+            batchers = dict(self._batchers)
+        return [dict(kind=kind, model=model_name, backend=backend, max_length=max_length, **batcher.stats())
+                for (kind, model_name, backend, max_length), batcher in batchers.items()]
+
+    def close(self):
+        with self._lock:
+            batchers, self._batchers = list(self._batchers.values()), {}
+        for batcher in batchers:
+            batcher.close()
+
+
+def encode_array(array):
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {'shape': list(array.shape), 'data': base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def decode_array(body):
+    return np.frombuffer(bytearray(base64.b64decode(body['data'])), dtype=np.float32).reshape(body['shape'])
+
+
+# POST /embed {"kind", "model", "backend", "max_length", "texts"} returns the
+# float32 matrix base64 encoded; GET /stats returns per-model batch counts
+class EmbeddingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+    pool = None
+
+    def do_GET(self):
+        if self.path != '/stats':
+            self._reply(404, {'error': f'Unknown path {self.path}'})
+            return
+        self._reply(200, {'models': self.pool.stats()})
+
+    def do_POST(self):
+        if self.path != '/embed':
+            self._reply(404, {'error': f'Unknown path {self.path}'})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            texts = request['texts']
+            batcher = self.pool.batcher(request.get('kind', 'transformer'), request['model'],
+                                        request.get('backend', DEFAULT_BACKEND), request.get('max_length'))
+        except (KeyError, TypeError, ValueError) as e:
+            self._reply(400, {'error': f'Bad request: {e}'})
+            return
+        try:
+            embeddings = batcher.submit(texts).result()
+        except Exception as e:
+            self._reply(500, {'error': f'{type(e).__name__}: {e}'})
+            return
+        self._reply(200, encode_array(embeddings))
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EmbeddingHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # every open app may connect at once
+
+
+def make_server(host=HOST, port=PORT, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+    handler = type('Handler', (EmbeddingHandler,), {'pool': ModelPool(max_batch, max_wait)})
+    return EmbeddingHTTPServer((host, port), handler)
+
+
+# Talks to the embedding server over one keep-alive connection per thread
+class EmbeddingClient:
+    def __init__(self, url=DEFAULT_SERVER, timeout=120):
+        parts = urlsplit(url if '//' in url else f'http://{url}')
+        self.url = url
+        self.host = parts.hostname or HOST
+        self.port = parts.port or PORT
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _request(self, method, path, payload=None):
+        body = None if payload is None else json.dumps(payload).encode('utf-8')
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        for attempt in range(2):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                data = json.loads(response.read())
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                # The server may have closed an idle keep-alive connection; reconnect once
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise EmbeddingServiceError(f"Embedding server at {self.url} dropped the connection: {e}")
+            except OSError as e:
+                connection.close()
+                self._local.connection = None
+                raise EmbeddingServiceError(f"Embedding server at {self.url} is not reachable: {e}")
+        if response.status != 200:
+            raise EmbeddingServiceError(f"Embedding server error {response.status}: {data.get('error')}")
+        return data
+
+    # (len(texts), dim) float32 matrix
+    def embed(self, texts, model_name, kind='transformer', backend=DEFAULT_BACKEND, max_length=None):
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return decode_array(self._request('POST', '/embed', {'kind': kind, 'model': model_name, 'backend': backend,
+                                                             'max_length': max_length, 'texts': texts}))
+
+    def stats(self):
+        return self._request('GET', '/stats')['models']
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+# Stands in for a SentenceTransformer in SectionSuggester and section_index:
+# encode() takes the same arguments and returns the same arrays
+class RemoteSentenceTransformer:
+    def __init__(self, client, model_name, backend=DEFAULT_BACKEND):
+        self.client = client
+        self.model_name = model_name
+        self.backend = check_backend(backend)
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, normalize_embeddings=False):
+        single = isinstance(sentences, str)
+        embeddings = self.client.embed([sentences] if single else sentences, self.model_name, 'sentence', self.backend)
+        if normalize_embeddings and embeddings.size:
+            embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve embedding models to the FIR and quiz apps, batching concurrent requests.')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help='texts per forward pass')
+    parser.add_argument('--max-wait', type=float, default=MAX_WAIT * 1000, help='ms a request waits for others to join its batch')
+    parser.add_argument('--preload', action='append', default=[],
+                        help='model to load at startup, as name[:kind[:backend]] (repeatable)')
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.max_batch, args.max_wait / 1000)
+    for spec in args.preload:
+        parts = spec.split(':')
+        model_name = parts[0]
+        kind = parts[1] if len(parts) > 1 else 'transformer'
+        backend = parts[2] if len(parts) > 2 else DEFAULT_BACKEND
+        start = time.perf_counter()
+        server.RequestHandlerClass.pool.embed(['warm up'], kind, model_name, backend)
+        print(f"Loaded {model_name} ({kind}, {backend}) in {time.perf_counter() - start:.1f}s")
+    print(f"Embedding server on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.RequestHandlerClass.pool.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import os
+import shutil
+
+import numpy as np
+
+from common.stage_timing import span
+
+# How the embedding models run on CPU:
+#   fp32 - the model as downloaded
+#   int8 - torch dynamic quantization of every Linear layer (weights stored as int8)
+#   onnx - exported ONNX graph run by onnxruntime (needs optimum[onnxruntime])
+BACKENDS = ('fp32', 'int8', 'onnx')
+DEFAULT_BACKEND = os.environ.get('EMBEDDING_BACKEND', 'fp32')
+# Exported ONNX models are kept here, one directory per model name, so the
+# export only happens on the first load
+ONNX_CACHE_DIR = os.environ.get('ONNX_CACHE_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'onnx_models')
+
+
+def check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+def onnx_cache_path(model_name, kind):
+    return os.path.join(ONNX_CACHE_DIR, f"{kind}-{model_name.strip(os.sep).replace(os.sep, '_').replace('/', '_')}")
+
+
+# Export with `export`, save to a temporary directory and move it into place,
+# so an interrupted export never leaves a half-written model to load next time
+def save_export(path, export):
+    model = export()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    model.save_pretrained(tmp_path)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another process finished the same export first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return model
+
+
+def quantize_dynamic(model):
+    import torch
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+# Tokenizer and encoder for the quiz apps; all three return last_hidden_state
+def load_transformer(model_name, backend=DEFAULT_BACKEND):
+    from transformers import AutoTokenizer, AutoModel
+    check_backend(backend)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if backend == 'onnx':
+        try:
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+        except ImportError:
+            raise RuntimeError("The onnx backend needs optimum[onnxruntime]: pip install 'optimum[onnxruntime]'")
+        path = onnx_cache_path(model_name, 'transformer')
+        if os.path.isdir(path):
+            return tokenizer, ORTModelForFeatureExtraction.from_pretrained(path)
+        return tokenizer, save_export(path, lambda: ORTModelForFeatureExtraction.from_pretrained(model_name, export=True))
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+    if backend == 'int8':
+        model = quantize_dynamic(model)
+    return tokenizer, model
+
+
+# Mean-pooled last_hidden_state of a load_transformer() model. The texts are
+# tokenized once and sorted by length, so each batch is only padded to its
+# longest member and one long text does not inflate every other batch.
+# Padding tokens are masked out of the mean, so batching never changes a
+# text's vector. Rows come back in the order the texts were given.
+def mean_pooled_embeddings(tokenizer, model, texts, max_length=None, batch_size=32):
+    import torch
+    texts = list(texts)
+    embeddings = np.empty((len(texts), model.config.hidden_size), dtype=np.float32)
+    if not texts:
+        return embeddings
+    with span('embed.tokenize'):
+        encodings = tokenizer(texts, truncation=True, max_length=max_length)
+        features = [{key: values[position] for key, values in encodings.items()} for position in range(len(texts))]
+        order = np.argsort([len(feature['input_ids']) for feature in features], kind='stable')
+    with torch.no_grad():
+        for start in range(0, len(texts), batch_size):
+            with span('embed.forward'):
+                positions = order[start:start + batch_size]
+                inputs = tokenizer.pad([features[position] for position in positions], return_tensors='pt')
+                hidden = model(**inputs).last_hidden_state
+                mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+                embeddings[positions] = pooled.numpy()
+    return embeddings
+
+
+def load_sentence_transformer(model_name, backend=DEFAULT_BACKEND):
+    from sentence_transformers import SentenceTransformer
+    check_backend(backend)
+    if backend == 'onnx':
+        path = onnx_cache_path(model_name, 'sentence-transformer')
+        if os.path.isdir(path):
+            return SentenceTransformer(path, device='cpu', backend='onnx')
+        return save_export(path, lambda: SentenceTransformer(model_name, device='cpu', backend='onnx'))
+    model = SentenceTransformer(model_name, device='cpu')
+    if backend == 'int8':
+        model = quantize_dynamic(model)
+    return model
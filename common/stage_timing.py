@@ -0,0 +1,231 @@
+import cProfile
+import os
+import threading
+import time
+from collections import deque
+
+# Per-stage timings of the FIR and quiz pipelines. Off unless PIPELINE_TIMING
+# is set or enable() is called; while off, span() and request() hand back one
+# shared do-nothing object, so the instrumented code costs a function call.
+#
+# Each stage keeps the last WINDOW durations (for p50/p95) and cumulative
+# Prometheus-style bucket counts. snapshot(), log_line() and
+# write_prometheus() export them; start_exporter() does so periodically.
+#
+# profile_next(path) (or PIPELINE_PROFILE=path) runs the next request() under
+# cProfile and saves the stats to path (open with pstats or snakeviz). cProfile
+# only sees the thread the request runs on; for work on other threads
+# (speech segments, the embedding server) use py-spy, e.g.
+# `py-spy record --threads -o profile.svg -- python self.py`: the worker
+# threads are named (tk-task, asr-segment, ...) so they are easy to tell apart.
+WINDOW = 1024
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EXPORT_PATH = os.environ.get('PIPELINE_TIMING_FILE') or None
+EXPORT_INTERVAL = float(os.environ.get('PIPELINE_TIMING_INTERVAL', 60))
+
+_enabled = bool(os.environ.get('PIPELINE_TIMING'))
+_profile_path = os.environ.get('PIPELINE_PROFILE') or None
+_stages = {}
+_lock = threading.Lock()
+
+
+class StageStats:
+    def __init__(self, window=WINDOW):
+        self.recent = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def add(self, seconds):
+        self.recent.append(seconds)
+        self.count += 1
+        self.total += seconds
+        for position, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[position] += 1
+
+    def summary(self):
+        recent = sorted(self.recent)
+        pick = lambda fraction: recent[min(int(fraction * len(recent)), len(recent) - 1)] if recent else 0.0
+        return {'count': self.count, 'mean': self.total / self.count if self.count else 0.0,
+                'p50': pick(0.50), 'p95': pick(0.95), 'max': recent[-1] if recent else 0.0}
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+
+
+def record(stage, seconds):
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            stats = _stages[stage] = StageStats()
+        stats.add(seconds)
+
+
+class _Span:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+# with span('fir.encode'): ... times the block when timing is on
+def span(stage):
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(stage)
+
+
+# A span around one whole request (a suggestion, a grade, a transcription);
+# also where a capture armed by profile_next() is taken
+class _Request(_Span):
+    __slots__ = ('profiler', 'path')
+
+    def __init__(self, stage, path):
+        super().__init__(stage)
+        self.path = path
+        self.profiler = None
+
+    def __enter__(self):
+        if self.path is not None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return super().__enter__()
+
+    def __exit__(self, *exc):
+        if _enabled:
+            super().__exit__(*exc)
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.path)
+            print(f"Profile of {self.stage} saved to {self.path}", flush=True)
+        return False
+
+
+def request(stage):
+    global _profile_path
+    if not _enabled and _profile_path is None:
+        return _NO_SPAN
+    path = None
+    if _profile_path is not None:
+        with _lock:
+            path, _profile_path = _profile_path, None
+    return _Request(stage, path)
+
+
+# Profile the next request() on any thread
+def profile_next(path='pipeline.prof'):
+    global _profile_path
+    with _lock:
+        _profile_path = path
+
+
+# {stage: {count, mean, p50, p95, max}} in seconds
+def snapshot():
+    with _lock:
+        return {stage: stats.summary() for stage, stats in sorted(_stages.items())}
+
+
+def log_line():
+    parts = [f"{stage} n={summary['count']} p50={summary['p50'] * 1000:.1f}ms p95={summary['p95'] * 1000:.1f}ms "
+             f"max={summary['max'] * 1000:.1f}ms" for stage, summary in snapshot().items()]
+    return 'timing ' + ('; '.join(parts) if parts else 'no stages recorded')
+
+
+# Prometheus text exposition format: a histogram per stage plus the rolling
+# p50/p95 as gauges
+def prometheus_text():
+    lines = ['# HELP pipeline_stage_seconds Time spent in each pipeline stage.',
+             '# TYPE pipeline_stage_seconds histogram']
+    with _lock:
+        stages = [(stage, list(stats.buckets), stats.count, stats.total, stats.summary()) for stage, stats in sorted(_stages.items())]
+    for stage, buckets, count, total, _ in stages:
+        for bound, bucket_count in zip(BUCKETS, buckets):
+            lines.append(f'pipeline_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {bucket_count}')
+        lines.append(f'pipeline_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+        lines.append(f'pipeline_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+        lines.append(f'pipeline_stage_seconds_count{{stage="{stage}"}} {count}')
+    lines += ['# HELP pipeline_stage_recent_seconds Quantiles over the last stage timings.',
+              '# TYPE pipeline_stage_recent_seconds gauge']
+    for stage, _, _, _, summary in stages:
+        for quantile in ('p50', 'p95'):
+            lines.append(f'pipeline_stage_recent_seconds{{stage="{stage}",quantile="0.{quantile[1:]}"}} {summary[quantile]:.6f}')
+    return '\n'.join(lines) + '\n'
+
+
+# Written to a temp file first, so a scraper never reads half a file
+def write_prometheus(path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+# Every `interval` seconds while timing is on, write the Prometheus file (if
+# `path` is given) or print log_line()
+def start_exporter(path=EXPORT_PATH, interval=EXPORT_INTERVAL):
+    def export():
+        while True:
+            time.sleep(interval)
+            if not _enabled:
+                continue
+            if path:
+                write_prometheus(path)
+            else:
+                print(log_line(), flush=True)
+
+    thread = threading.Thread(target=export, name='timing-export', daemon=True)
+    thread.start()
+    return thread
+
+
+def toggle():
+    if _enabled:
+        disable()
+    else:
+        enable()
+    print(f"Pipeline timing {'on' if _enabled else 'off'}", flush=True)
+
+
+# Keyboard switches for the Tk apps: Ctrl+Alt+T turns timing on and off,
+# Ctrl+Alt+P profiles the next request, Ctrl+Alt+L prints the timings
+def bind_keys(root, profile_path='pipeline.prof'):
+    root.bind_all('<Control-Alt-t>', lambda event: toggle())
+    root.bind_all('<Control-Alt-p>', lambda event: (profile_next(profile_path),
+                                                    print(f"Profiling the next request to {profile_path}", flush=True)))
+    root.bind_all('<Control-Alt-l>', lambda event: print(log_line(), flush=True))
@@ -0,0 +1,25 @@
+import os
+import time
+
+# Set by benchmarks/startup.py. The apps then print a timestamp when their
+# window is first drawn and when their first result is ready, and exit.
+ENABLED = bool(os.environ.get('STARTUP_BENCHMARK'))
+
+
+def mark(event):
+    if ENABLED:
+        print(f"STARTUP {event} {time.time():.6f}", flush=True)
+
+
+# Print first_window as soon as Tk has drawn the window
+def watch_window(root):
+    if ENABLED:
+        root.after_idle(lambda: mark('first_window'))
+
+
+# Run one sample request once the models are ready, then close the app
+def run_first_result(root, func, *args):
+    if ENABLED:
+        func(*args)
+        mark('first_result')
+        root.after(0, root.destroy)
@@ -0,0 +1,73 @@
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Lowercase, tokenize, drop stop words and stem/lemmatize each remaining token.
+# The stop word set and stemmer are built once per instance, and the per-token
+# stem/lemma lookup is memoized with a bounded LRU cache.
+class TextPreprocessor:
+    def __init__(self, normalizer='stem', language='english', cache_size=65536):
+        self.normalizer = normalizer
+        self.language = language
+        self.cache_size = cache_size
+        # NLTK is imported here rather than at module level so importing this module stays cheap
+        from nltk.tokenize import word_tokenize
+        from nltk.corpus import stopwords
+        self.tokenize = word_tokenize
+        self.stop_words = frozenset(stopwords.words(language))
+        if normalizer == 'stem':
+            from nltk.stem import PorterStemmer
+            normalize = PorterStemmer().stem
+        elif normalizer == 'lemma':
+            from nltk.stem import WordNetLemmatizer
+            normalize = WordNetLemmatizer().lemmatize
+        else:
+            raise ValueError(f"Unknown normalizer '{normalizer}', expected 'stem' or 'lemma'")
+        self.normalize_token = functools.lru_cache(maxsize=cache_size)(normalize)
+
+    def __call__(self, text):
+        return self.preprocess(text)
+
+    def preprocess(self, text):
+        tokens = self.tokenize(text.lower())
+        return ' '.join(self.normalize_token(token) for token in tokens if token not in self.stop_words)
+
+    # Preprocess a list of texts, optionally spread over a pool of worker processes
+    def preprocess_many(self, texts, workers=None, chunksize=256):
+        texts = list(texts)
+        if workers is None or workers <= 1 or len(texts) <= chunksize:
+            return [self.preprocess(text) for text in texts]
+        chunks = [texts[start:start + chunksize] for start in range(0, len(texts), chunksize)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.normalizer, self.language, self.cache_size)) as pool:
+            return [text for chunk in pool.map(_preprocess_chunk, chunks) for text in chunk]
+
+    def cache_info(self):
+        return self.normalize_token.cache_info()
+
+
+# One shared preprocessor per configuration for the whole process
+@functools.lru_cache(maxsize=None)
+def get_preprocessor(normalizer='stem', language='english'):
+    return TextPreprocessor(normalizer, language)
+
+
+def preprocess_many(texts, normalizer='stem', workers=None, chunksize=256):
+    return get_preprocessor(normalizer).preprocess_many(texts, workers, chunksize)
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+_worker_preprocessor = None
+
+
+def _init_worker(normalizer, language, cache_size):
+    global _worker_preprocessor
+    _worker_preprocessor = TextPreprocessor(normalizer, language, cache_size)
+
+
+def _preprocess_chunk(texts):
+    return [_worker_preprocessor.preprocess(text) for text in texts]
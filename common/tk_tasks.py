@@ -0,0 +1,164 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# How often the Tk thread picks up finished work, about once per frame at 60fps
+POLL_MS = 16
+
+_local = threading.local()
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+# The task running on this worker thread, or None outside a TaskRunner job
+def current_task():
+    return getattr(_local, 'task', None)
+
+
+# For long jobs: report how far along they are (fraction in 0..1, or None if
+# unknown) and stop early once cancelled. Both do nothing outside a task, so
+# library code can call them unconditionally.
+def report_progress(fraction=None, message=None):
+    task = current_task()
+    if task is not None:
+        task.report(fraction, message)
+
+
+def check_cancelled():
+    task = current_task()
+    if task is not None and task.cancelled.is_set():
+        raise TaskCancelled()
+
+
+class Task:
+    def __init__(self, runner, key, func, args):
+        self.runner = runner
+        self.key = key
+        self.func = func
+        self.args = args
+        self.cancelled = threading.Event()
+        self.future = None
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def report(self, fraction=None, message=None):
+        if not self.cancelled.is_set():
+            self.runner._events.put((self, 'progress', (fraction, message)))
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+
+# Runs slow work (model inference, speech recognition, HTTP calls) on a small
+# thread pool and hands the outcome back to the Tk thread. Tk widgets must only
+# be touched from the thread running mainloop, so workers never call the
+# callbacks themselves: they queue the result and an after() loop on the Tk
+# thread delivers it to on_done / on_error / on_progress. The loop only runs
+# while there is work in flight.
+#
+# Tasks with the same key do not pile up. While one is pending, submitting
+# the same call again returns the pending task (a repeated click), and a call
+# with different arguments cancels it and takes its place (the newer request
+# wins). A cancelled task's callbacks are never called.
+class TaskRunner:
+    def __init__(self, root, max_workers=2, poll_ms=POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tk-task')
+        self._events = queue.Queue()
+        self._callbacks = {}
+        self._pending = {}
+        self._polling = False
+
+    # Call from the Tk thread only
+    def submit(self, func, *args, key=None, on_done=None, on_error=None, on_progress=None):
+        if key is not None and key in self._pending:
+            pending = self._pending[key]
+            if pending.func == func and pending.args == args:
+                return pending
+            self._pending.pop(key).cancel()
+        task = Task(self, key, func, args)
+        self._callbacks[task] = (on_done, on_error, on_progress)
+        if key is not None:
+            self._pending[key] = task
+        task.future = self._executor.submit(self._run, task, func, args)
+        self._poll()
+        return task
+
+    def pending(self, key):
+        return self._pending.get(key)
+
+    def cancel(self, key):
+        task = self._pending.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def shutdown(self):
+        for task in list(self._pending.values()):
+            task.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, task, func, args):
+        if task.cancelled.is_set():
+            return
+        _local.task = task
+        try:
+            result = func(*args)
+        except TaskCancelled:
+            return
+        except Exception as e:
+            self._events.put((task, 'error', e))
+        else:
+            self._events.put((task, 'done', result))
+        finally:
+            _local.task = None
+
+    def _poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._drain)
+
+    def _drain(self):
+        while True:
+            try:
+                task, kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            self._deliver(task, kind, value)
+        # Drop tasks that ended without reporting back (cancelled before they started)
+        for task in [task for task in self._callbacks if task.done() and task.cancelled.is_set()]:
+            self._finish(task)
+        if self._callbacks:
+            self.root.after(self.poll_ms, self._drain)
+        else:
+            self._polling = False
+
+    def _deliver(self, task, kind, value):
+        if task not in self._callbacks:
+            return
+        on_done, on_error, on_progress = self._callbacks[task]
+        if kind == 'progress':
+            if on_progress is not None and not task.cancelled.is_set():
+                on_progress(*value)
+            return
+        self._finish(task)
+        if task.cancelled.is_set():
+            return
+        if kind == 'done' and on_done is not None:
+            on_done(value)
+        elif kind == 'error':
+            if on_error is not None:
+                on_error(value)
+            else:
+                print(f"Background task failed: {value!r}")
+
+    def _finish(self, task):
+        self._callbacks.pop(task, None)
+        if task.key is not None and self._pending.get(task.key) is task:
+            del self._pending[task.key]